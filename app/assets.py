@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select, update
+from auth import get_current_user
+from database import admitted_session, session_scope
+from models import Crew, Manga
+from schemas import AssetOut
+
+# Fichiers rangés sous leur empreinte SHA-256 : un même fichier envoyé deux fois n'est stocké qu'une fois,
+# et une URL ne change jamais de contenu (cache d'un an côté client)
+ASSET_DIR = os.getenv("ASSET_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"))
+ASSET_MAX_BYTES = int(os.getenv("ASSET_MAX_BYTES", str(10 << 20)))
+ASSET_MAX_PIXELS = int(os.getenv("ASSET_MAX_PIXELS", "40000000"))
+ASSET_THUMBNAIL_SIZES = tuple(sorted({int(size) for size in os.getenv("ASSET_THUMBNAIL_SIZES", "128,512").split(",") if size.strip()}))
+ASSET_POOL_WORKERS = int(os.getenv("ASSET_POOL_WORKERS", "2"))
+ASSET_QUEUE_LIMIT = int(os.getenv("ASSET_QUEUE_LIMIT", "16"))
+ASSET_URL = "/fastapi/assets"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MEDIA_TYPES = {"png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp"}
+# "<sha256>.<ext>" pour l'original, "<sha256>-<taille>.webp" pour ses vignettes
+ASSET_NAME = re.compile(r"^[0-9a-f]{64}(?:-[0-9]+)?\.(?:png|jpg|gif|webp)$")
+DATA_URI = re.compile(r"^data:image/[a-z+.-]+;base64,", re.IGNORECASE)
+
+logger = logging.getLogger("assets")
+
+def sniff(head: bytes) -> Optional[str]:
+    # Le format vient des premiers octets, jamais du Content-Type annoncé par le client
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def asset_path(name: str) -> str:
+    return os.path.join(ASSET_DIR, name[:2], name)
+
+def thumbnail_name(digest: str, size: int) -> str:
+    return f"{digest}-{size}.webp"
+
+def asset_info(name: str, size: int, width: int, height: int) -> dict:
+    digest, _, ext = name.partition(".")
+    return {
+        "ref": name,
+        "url": f"{ASSET_URL}/{name}",
+        "media_type": MEDIA_TYPES[ext],
+        "size": size,
+        "width": width,
+        "height": height,
+        "thumbnails": {thumb: f"{ASSET_URL}/{thumbnail_name(digest, thumb)}" for thumb in ASSET_THUMBNAIL_SIZES},
+    }
+
+def write_atomic(path: str, save):
+    # Fichier temporaire du même dossier puis rename : un lecteur ne voit jamais de fichier partiel
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            save(file)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def make_thumbnails(source: str, digest: str, sizes: tuple, max_pixels: int) -> tuple:
+    # Exécuté dans le pool de processus : décodage et redimensionnement hors de la boucle d'événements
+    with Image.open(source) as image:
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ValueError(f"Image larger than {max_pixels} pixels")
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        os.makedirs(os.path.join(ASSET_DIR, digest[:2]), exist_ok=True)
+        for size in sizes:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            write_atomic(asset_path(thumbnail_name(digest, size)), lambda file: thumbnail.save(file, "WEBP", quality=80))
+    return width, height
+
+def image_size(path: str) -> tuple:
+    # Seul l'en-tête est lu
+    with Image.open(path) as image:
+        return image.size
+
+class ThumbnailPool:
+    # Même principe que le pool bcrypt : processus bornés, 503 au-delà de max_pending vignettes en attente
+    def __init__(self, workers: int = ASSET_POOL_WORKERS, max_pending: int = ASSET_QUEUE_LIMIT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.generated = 0
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def generate(self, source: str, digest: str) -> tuple:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Thumbnail workers busy, retry later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            size = await asyncio.get_running_loop().run_in_executor(self.executor, make_thumbnails, source, digest, ASSET_THUMBNAIL_SIZES, ASSET_MAX_PIXELS)
+        except (UnidentifiedImageError, ValueError, OSError, Image.DecompressionBombError) as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid image: {exc}")
+        finally:
+            self.pending -= 1
+        self.generated += 1
+        return size
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending, "rejected": self.rejected, "generated": self.generated}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+thumbnail_pool = ThumbnailPool()
+
+def is_stored(digest: str, name: str) -> bool:
+    return all(os.path.exists(asset_path(path)) for path in (name, *(thumbnail_name(digest, size) for size in ASSET_THUMBNAIL_SIZES)))
+
+async def store_asset(chunks: AsyncIterator[bytes]) -> dict:
+    # Corps écrit en flux dans ASSET_DIR/tmp (même système de fichiers : le rename final est atomique)
+    tmp_dir = os.path.join(ASSET_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        with os.fdopen(fd, "wb") as file:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > ASSET_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Assets are limited to {ASSET_MAX_BYTES} bytes")
+                if len(head) < 12:
+                    head += chunk[:12]
+                digest.update(chunk)
+                await run_in_threadpool(file.write, chunk)
+        ext = sniff(head)
+        if ext is None:
+            raise HTTPException(status_code=415, detail=f"Unsupported image format, expected one of {', '.join(MEDIA_TYPES)}")
+        digest = digest.hexdigest()
+        name = f"{digest}.{ext}"
+        if is_stored(digest, name):
+            width, height = await run_in_threadpool(image_size, asset_path(name))
+        else:
+            width, height = await thumbnail_pool.generate(tmp, digest)
+            os.replace(tmp, asset_path(name))
+        return asset_info(name, size, width, height)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+async def request_chunks(request: Request) -> AsyncIterator[bytes]:
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > ASSET_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Assets are limited to {ASSET_MAX_BYTES} bytes")
+    async for chunk in request.stream():
+        yield chunk
+
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {media_type: {"schema": {"type": "string", "format": "binary"}} for media_type in MEDIA_TYPES.values()},
+    },
+}
+
+def add_asset_route(router: APIRouter, item_path: str, singular: str, model, field: str, not_found: str):
+    # PUT /mangas/{manga_id}/image : la colonne ne garde que la référence "<sha256>.<ext>"
+    # Pas de get_async_db : ni connexion ni place d'admission pendant l'envoi et le calcul des vignettes.
+    # Le fichier est stocké d'abord, la session ne sert qu'à l'UPDATE (un fichier orphelin sur 404 est sans effet)
+    async def upload(request: Request, item_id: int = Path(alias=f"{singular}_id"), current_user: str = Depends(get_current_user)):
+        asset = await store_asset(request_chunks(request))
+        stmt = update(model).where(model.id == item_id).values({field: asset["ref"]}).returning(model.id)
+        async with admitted_session() as db:
+            if (await db.execute(stmt.execution_options(changed_ids=(item_id,)))).scalar_one_or_none() is None:
+                raise HTTPException(status_code=404, detail=not_found)
+            await db.commit()
+        return asset
+
+    upload.__name__ = f"upload_{singular}_{field}"
+    router.add_api_route(f"{item_path}/{field}", upload, methods=["PUT"], response_model=AssetOut, openapi_extra=UPLOAD_OPENAPI)
+
+router = APIRouter()
+
+@router.post("/assets", response_model=AssetOut, openapi_extra=UPLOAD_OPENAPI)
+async def upload_asset(request: Request, current_user: str = Depends(get_current_user)):
+    return await store_asset(request_chunks(request))
+
+@router.api_route("/assets/{name}", methods=["GET", "HEAD"], response_class=FileResponse)
+async def read_asset(request: Request, name: str):
+    # Sans authentification, pour être utilisable directement dans une balise <img>.
+    # Les Range et l'envoi sans copie (http.response.pathsend) sont gérés par FileResponse
+    if not ASSET_NAME.match(name):
+        raise HTTPException(status_code=404, detail="Asset not found")
+    etag = f'"{name.partition(".")[0]}"'
+    headers = {"etag": etag, "cache-control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    path = asset_path(name)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return FileResponse(path, headers=headers, media_type=MEDIA_TYPES[name.rpartition(".")[2]], stat_result=stat_result)
+
+@router.get("/debug/assets")
+def read_asset_stats(current_user: str = Depends(get_current_user)):
+    return thumbnail_pool.stats()
+
+ASSET_COLUMNS = ((Manga, "image"), (Crew, "flag"))
+
+async def migrate_data_uris(db, batch_size: int = 100) -> dict:
+    # Les images base64 déjà en base ("data:image/png;base64,...") deviennent des assets ; les URL externes restent
+    converted = {}
+    for model, field in ASSET_COLUMNS:
+        column = getattr(model, field)
+        converted[model.__tablename__] = 0
+        last_id = 0
+        while True:
+            rows = (await db.execute(
+                select(model.id, column).where(model.id > last_id, column.like("data:%")).order_by(model.id).limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            for item_id, value in rows:
+                last_id = item_id
+                match = DATA_URI.match(value)
+                if match is None:
+                    continue
+                try:
+                    data = base64.b64decode(value[match.end():], validate=True)
+                except binascii.Error:
+                    logger.warning("%s %s: invalid base64, skipped", model.__tablename__, item_id)
+                    continue
+
+                async def single_chunk():
+                    yield data
+
+                try:
+                    asset = await store_asset(single_chunk())
+                except HTTPException as exc:
+                    logger.warning("%s %s: %s, skipped", model.__tablename__, item_id, exc.detail)
+                    continue
+                await db.execute(update(model).where(model.id == item_id).values({field: asset["ref"]}).execution_options(changed_ids=(item_id,)))
+                converted[model.__tablename__] += 1
+            await db.commit()
+    return converted
+
+async def main():
+    parser = argparse.ArgumentParser(description="Convert base64 images stored in mangas.image and crews.flag into assets")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    try:
+        async with session_scope() as db:
+            print(await migrate_data_uris(db, args.batch_size))
+    finally:
+        thumbnail_pool.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,34 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Union
+from typing import Callable, Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from fastapi import HTTPException, status  # Assurez-vous d'importer ces modules
+from fastapi import Depends, HTTPException, Request, status  # Assurez-vous d'importer ces modules
+from fastapi.security import OAuth2PasswordBearer
+from ratelimit import rate_limiter
 
 SECRET_KEY = "quentin92"  # Changez ceci par une clé secrète plus sécurisée
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Coût bcrypt réglable : les hashes d'un autre coût sont recalculés à la prochaine connexion
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 class Token(BaseModel):
     access_token: str
@@ -28,7 +47,61 @@ def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+class TokenCache:
+    # Claims déjà vérifiées, indexées par le token brut et gardées jusqu'à leur "exp".
+    # is_revoked est consulté à chaque lecture, y compris sur un token en cache
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, is_revoked: Optional[Callable[[str, dict], bool]] = None):
+        self.maxsize = maxsize
+        self.is_revoked = is_revoked
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+
+    def get(self, token: str) -> Optional[TokenData]:
+        entry = self._entries.get(token)
+        if entry is not None and entry[1] > time.time() and not self.revoked(token, entry[2]):
+            self.hits += 1
+            return entry[0]
+        if entry is not None:
+            self._entries.pop(token, None)
+        self.misses += 1
+        return None
+
+    def revoked(self, token: str, payload: dict) -> bool:
+        return self.is_revoked is not None and self.is_revoked(token, payload)
+
+    def put(self, token: str, token_data: TokenData, payload: dict):
+        if self.maxsize <= 0:
+            return
+        if len(self._entries) >= self.maxsize:
+            self.purge_expired()
+        while len(self._entries) >= self.maxsize:
+            self._entries.pop(next(iter(self._entries)), None)
+        self._entries[token] = (token_data, float(payload["exp"]), payload)
+
+    def purge_expired(self):
+        now = time.time()
+        for token in [token for token, (_, expires_at, _) in self._entries.items() if expires_at <= now]:
+            self._entries.pop(token, None)
+
+    def revoke(self, token: str):
+        self._entries.pop(token, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache()
+
 def verify_token(token: str):
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -39,12 +112,85 @@ def verify_token(token: str):
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        return TokenData(username=username)
+        if token_cache.revoked(token, payload):
+            raise credentials_exception
+        token_data = TokenData(username=username)
+        if "exp" in payload:
+            token_cache.put(token, token_data, payload)
+        return token_data
+    except JWTError:
+        raise credentials_exception
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    # Sous-requêtes de /batch : le token a déjà été vérifié une fois pour tout le lot, qui a aussi payé leur coût
+    batch_user = getattr(request.state, "batch_user", None)
+    if batch_user is not None:
+        return batch_user
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = verify_token(token)
+        username: str = payload.username
+        if username is None:
+            raise credentials_exception
     except JWTError:
         raise credentials_exception
+    await rate_limiter.check(request, username)
+    return username
 
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
+
+def password_needs_update(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password)
+
+class PasswordHasher:
+    # bcrypt tourne dans un pool de processus borné ; au-delà de max_pending on répond 503
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_QUEUE_LIMIT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password service busy, retry later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(get_password_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
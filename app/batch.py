@@ -0,0 +1,107 @@
+import asyncio
+import os
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from auth import get_current_user
+from database import admitted_session
+from ratelimit import rate_limiter
+from schemas import BatchRequest, BatchResponse
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+# Corps d'une sous-réponse gardé en mémoire (toutes sont renvoyées ensemble) : au-delà, 413 pour cette entrée
+BATCH_MAX_RESPONSE_BYTES = int(os.getenv("BATCH_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+BATCH_PREFIX = "/fastapi/"
+# Exports NDJSON/CSV et fichiers : faits pour être lus en flux, pas pour être chargés en entier dans la réponse du lot
+STREAMING_PATHS = ("*/export", "/fastapi/assets/*")
+
+router = APIRouter(dependencies=[Depends(get_current_user)])
+
+def sub_scope(request: Request, path: str, query: str, db, user: str) -> dict:
+    # Même connexion client que la requête parente ; l'état porte la session et l'utilisateur déjà vérifié
+    scope = request.scope
+    headers = [(name, value) for name, value in scope["headers"] if name in (b"authorization", b"accept", b"accept-encoding")]
+    return {
+        "type": "http",
+        "asgi": scope.get("asgi", {"version": "3.0"}),
+        "http_version": scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": scope.get("scheme", "http"),
+        "server": scope.get("server"),
+        "client": scope.get("client"),
+        "root_path": scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "state": {**scope.get("state", {}), "batch_db": db, "batch_user": user},
+    }
+
+def sub_receive():
+    # Corps vide, puis attente de la fin de la sous-requête : StreamingResponse guette http.disconnect
+    # en boucle, un receive qui répondrait sans jamais suspendre bloquerait toute la boucle d'événements
+    done = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    return receive, done
+
+async def run_sub_request(request: Request, url: str, db, user: str) -> dict:
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith(BATCH_PREFIX) or parts.path.rstrip("/") == request.url.path.rstrip("/"):
+        return {"path": url, "status": 400, "body": {"detail": f"Batch paths must start with {BATCH_PREFIX} and cannot be nested"}}
+    if any(fnmatchcase(parts.path.rstrip("/"), pattern) for pattern in STREAMING_PATHS):
+        return {"path": url, "status": 400, "body": {"detail": "Streaming routes (exports, files) cannot be batched"}}
+    status = 500
+    headers = {}
+    chunks = []
+    size = 0
+    receive, done = sub_receive()
+
+    async def send(message):
+        nonlocal status, headers, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers = {name.decode().lower(): value.decode() for name, value in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            size += len(body)
+            if size <= BATCH_MAX_RESPONSE_BYTES:
+                chunks.append(body)
+            else:
+                chunks.clear()
+
+    try:
+        await request.app(sub_scope(request, parts.path, parts.query, db, user), receive, send)
+    except Exception:
+        # ServerErrorMiddleware a déjà envoyé la réponse 500 avant de relever l'exception
+        await db.rollback()
+        return {"path": url, "status": 500, "body": {"detail": "Internal Server Error"}}
+    finally:
+        done.set()
+    if size > BATCH_MAX_RESPONSE_BYTES:
+        return {"path": url, "status": 413, "body": {"detail": f"Response larger than {BATCH_MAX_RESPONSE_BYTES} bytes, request it outside the batch"}}
+    body = b"".join(chunks)
+    if headers.get("content-type", "").startswith("application/json") and body:
+        body = orjson.loads(body)
+    else:
+        body = body.decode(errors="replace")
+    return {"path": url, "status": status, "etag": headers.get("etag"), "body": body}
+
+@router.post("/batch", response_model=BatchResponse)
+async def run_batch(batch: BatchRequest, request: Request, current_user: str = Depends(get_current_user)):
+    # Lectures seulement, exécutées l'une après l'autre sur la même session (une session n'est pas concurrente)
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_REQUESTS} requests per batch")
+    # Les sous-requêtes ne passent pas par la limite de débit : le lot paie leurs coûts, avant de prendre une place d'admission
+    await rate_limiter.charge(current_user, sum(rate_limiter.cost_for(item.method, urlsplit(item.path).path) for item in batch.requests))
+    async with admitted_session() as db:
+        return {"responses": [await run_sub_request(request, item.path, db, current_user) for item in batch.requests]}
@@ -0,0 +1,92 @@
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import get_current_user
+from changes import record
+from database import get_async_db
+from schemas import BulkResult
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "10000"))
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+BULK_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            "application/x-ndjson": {"schema": {"type": "string"}},
+        },
+    }
+}
+
+async def read_bulk_body(request: Request):
+    # Renvoie [(index, dict)] et les erreurs de décodage ligne par ligne pour le NDJSON
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    rows, errors = [], []
+    if content_type in NDJSON_TYPES:
+        index = 0
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append((index, json.loads(line)))
+            except ValueError as e:
+                errors.append({"index": index, "detail": f"Invalid JSON: {e}"})
+            index += 1
+    else:
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array or an NDJSON body")
+        rows = list(enumerate(payload))
+    if len(rows) + len(errors) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+    return rows, errors
+
+async def bulk_insert(db: AsyncSession, model, create_schema, rows, errors=None):
+    table = model.__table__
+    errors = list(errors or [])
+    valid = []
+    for index, raw in rows:
+        try:
+            valid.append((index, create_schema.model_validate(raw).model_dump()))
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors(include_url=False, include_context=False)})
+
+    created = []
+    if valid:
+        # Un seul INSERT ... VALUES (...), (...) RETURNING id ; en cas d'échec on isole les lignes fautives
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        try:
+            async with db.begin_nested():
+                result = await db.execute(stmt, [values for _, values in valid])
+                ids = result.scalars().all()
+            created = [{"index": index, "id": row_id} for (index, _), row_id in zip(valid, ids)]
+        except DBAPIError:
+            for index, values in valid:
+                try:
+                    async with db.begin_nested():
+                        row_id = (await db.execute(stmt, [values])).scalar_one()
+                    created.append({"index": index, "id": row_id})
+                except DBAPIError as e:
+                    errors.append({"index": index, "detail": str(e.orig)})
+        record(db, table.name, [row["id"] for row in created])
+        await db.commit()
+
+    errors.sort(key=lambda error: error["index"])
+    return {"created": created, "errors": errors}
+
+def add_bulk_route(router: APIRouter, path: str, model, create_schema):
+    async def create_bulk(request: Request, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+        rows, errors = await read_bulk_body(request)
+        return await bulk_insert(db, model, create_schema, rows, errors)
+
+    create_bulk.__name__ = f"create_{model.__tablename__}_bulk"
+    router.add_api_route(f"/{path}/bulk", create_bulk, methods=["POST"], response_model=BulkResult, openapi_extra=BULK_OPENAPI)
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from database import ASYNC_DATABASE_URL, DATABASE_URL
+
+# "memory" : un seul processus ; "postgres" : NOTIFY/LISTEN pour prévenir les autres workers
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "postgres" if DATABASE_URL.startswith("postgresql") else "memory")
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "cache_invalidation")
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+logger = logging.getLogger("bus")
+
+class InvalidationBus:
+    # Événements (table, ids) : ids est un ensemble d'identifiants, ou None pour "toute la table".
+    # Un handler appelé avec (None, None) doit tout oublier (messages potentiellement perdus).
+    # remote=False : le handler ne reçoit que les écritures faites par ce processus.
+    def __init__(self):
+        self._handlers = []
+
+    def subscribe(self, handler, remote: bool = True):
+        self._handlers.append((handler, remote))
+        return handler
+
+    def deliver(self, table, ids, remote: bool = False):
+        for handler, wants_remote in list(self._handlers):
+            if remote and not wants_remote:
+                continue
+            try:
+                handler(table, ids)
+            except Exception:
+                logger.exception("invalidation handler failed for %s", table)
+
+    def deliver_changes(self, changes: dict, remote: bool = False):
+        for table, ids in changes.items():
+            self.deliver(table, ids, remote)
+
+    def before_commit(self, session, changes: dict):
+        pass
+
+    def publish(self, changes: dict):
+        self.deliver_changes(changes)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class InMemoryBus(InvalidationBus):
+    pass
+
+class PostgresNotifyBus(InvalidationBus):
+    def __init__(self, dsn: str, channel: str = INVALIDATION_CHANNEL):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._task = None
+        self._connection = None
+
+    def encode(self, changes: dict) -> str:
+        payload = {"origin": self.origin, "changes": {table: sorted(ids) if ids is not None else None for table, ids in changes.items()}}
+        encoded = json.dumps(payload, separators=(",", ":"))
+        if len(encoded) > NOTIFY_PAYLOAD_LIMIT:
+            # NOTIFY est limité à 8000 octets : on retombe sur une invalidation par table
+            payload["changes"] = {table: None for table in changes}
+            encoded = json.dumps(payload, separators=(",", ":"))
+        return encoded
+
+    def before_commit(self, session, changes: dict):
+        # NOTIFY est transactionnel : les autres workers ne le reçoivent que si le commit réussit
+        session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": self.encode(changes)})
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("ignoring malformed invalidation payload")
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.deliver_changes({table: set(ids) if ids is not None else None for table, ids in message.get("changes", {}).items()}, remote=True)
+
+    async def _listen(self):
+        import asyncpg
+
+        delay = 1
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                await self._connection.add_listener(self.channel, self._on_notification)
+                # Des notifications ont pu être manquées pendant la (re)connexion
+                self.deliver(None, None, remote=True)
+                delay = 1
+                while not self._connection.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("invalidation listener disconnected, retrying in %ss", delay)
+            if self._connection is not None and not self._connection.is_closed():
+                self._connection.terminate()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+def create_bus(kind: str = INVALIDATION_BUS) -> InvalidationBus:
+    if kind == "postgres":
+        dsn = make_url(ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresNotifyBus(dsn)
+    return InMemoryBus()
+
+invalidation_bus = create_bus()
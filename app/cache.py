@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import inspect
+from auth import verify_token
+from bus import invalidation_bus
+from ratelimit import rate_limiter
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+
+class ResponseCache:
+    # LRU + TTL de réponses JSON déjà sérialisées, indexées aussi par table pour l'invalidation
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.bytes = 0
+        # Incrémenté à chaque invalidation : une réponse calculée pendant une écriture n'est pas stockée
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._keys_by_table = defaultdict(set)
+        # invalidate() peut être appelé depuis le threadpool (DB_MODE=sync), pendant que la boucle lit le cache
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body: bytes, media_type: str, tables, generation: int, row=None):
+        entry = {
+            "body": body,
+            "media_type": media_type,
+            "etag": '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest(),
+            "tables": frozenset(tables),
+            "row": row,
+            "expires_at": time.monotonic() + self.ttl,
+        }
+        with self._lock:
+            if self.maxsize <= 0 or generation != self.generation:
+                return None
+            self._remove(key)
+            while len(self._entries) >= self.maxsize:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = entry
+            self.bytes += len(body)
+            for table in entry["tables"]:
+                self._keys_by_table[table].add(key)
+            return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= len(entry["body"])
+        for table in entry["tables"]:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+    def invalidate(self, table, ids=None):
+        # Une entrée liée à une seule ligne ("row") ne tombe que si cette ligne fait partie des ids
+        with self._lock:
+            self.generation += 1
+            if table is None:
+                self.invalidations += len(self._entries)
+                self._clear()
+                return
+            for key in list(self._keys_by_table.get(table, ())):
+                row = self._entries[key]["row"]
+                if ids is None or row is None or row[0] != table or row[1] in ids:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._keys_by_table.clear()
+        self.bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+response_cache = ResponseCache()
+invalidation_bus.subscribe(response_cache.invalidate)
+
+def related_tables(model) -> set:
+    mapper = inspect(model)
+    return {mapper.local_table.name, *(relationship.mapper.local_table.name for relationship in mapper.relationships)}
+
+def request_user(request: Request):
+    batch_user = getattr(request.state, "batch_user", None)
+    if batch_user is not None:
+        return batch_user
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return verify_token(token).username
+    except HTTPException:
+        return None
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def cached_route(tables, row_table=None, row_param=None):
+    # Classe de route : GET servis depuis le cache (clé = chemin, paramètres, utilisateur), avec ETag / 304
+    class CachedRoute(APIRoute):
+        cache_tables = frozenset(tables)
+
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+
+            async def cached_handler(request: Request) -> Response:
+                user = request_user(request)
+                if request.method != "GET" or user is None or getattr(request.state, "bypass_cache", False):
+                    return await handler(request)
+                key = (request.url.path, tuple(sorted(request.query_params.multi_items())), user)
+                entry = response_cache.get(key)
+                if entry is None:
+                    generation = response_cache.generation
+                    response = await handler(request)
+                    body = getattr(response, "body", None)
+                    if response.status_code != 200 or not isinstance(body, bytes):
+                        return response
+                    row = (row_table, int(request.path_params[row_param])) if row_param else None
+                    entry = response_cache.set(key, body, response.media_type, self.cache_tables, generation, row)
+                    if entry is None:
+                        return response
+                    response.headers["ETag"] = entry["etag"]
+                    response.headers["X-Cache"] = "MISS"
+                    if not not_modified(request, entry["etag"]):
+                        return response
+                else:
+                    # Réponse servie sans passer par get_current_user : la limite de débit s'applique quand même
+                    if getattr(request.state, "batch_user", None) is None:
+                        await rate_limiter.check(request, user)
+                    if not not_modified(request, entry["etag"]):
+                        return Response(entry["body"], media_type=entry["media_type"], headers={"ETag": entry["etag"], "X-Cache": "HIT"})
+                return Response(status_code=304, headers={"ETag": entry["etag"]})
+
+            return cached_handler
+
+    return CachedRoute
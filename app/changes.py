@@ -0,0 +1,54 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from bus import invalidation_bus
+
+# Lignes modifiées par une session : {table: ids} (None = toute la table), publiées une fois le commit effectif.
+# `session` peut aussi être une AsyncSession ou une ThreadedSession (même dictionnaire info).
+
+def record(session, table: str, ids=None):
+    changes = session.info.setdefault("changes", {})
+    if ids is None or changes.get(table, set()) is None:
+        changes[table] = None
+    else:
+        changes.setdefault(table, set()).update(ids)
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement(orm_execute_state):
+    if orm_execute_state.is_insert:
+        # Une insertion ne touche aucune ligne déjà en cache, seulement les listes ;
+        # l'appelant ajoute les ids insérés une fois connus (RETURNING)
+        record(orm_execute_state.session, orm_execute_state.statement.table.name, ())
+    elif orm_execute_state.is_update or orm_execute_state.is_delete:
+        record(orm_execute_state.session, orm_execute_state.statement.table.name, orm_execute_state.execution_options.get("changed_ids"))
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    for obj in session.new:
+        mapper = inspect(obj).mapper
+        record(session, mapper.local_table.name, mapper.primary_key_from_instance(obj)[:1])
+    for obj in (*session.dirty, *session.deleted):
+        state = inspect(obj)
+        record(session, state.mapper.local_table.name, state.identity)
+
+# before_commit / after_commit sont aussi émis à la libération d'un SAVEPOINT : seul le vrai commit publie
+
+@event.listens_for(Session, "before_commit")
+def _notify_commit(session):
+    if session.in_nested_transaction():
+        return
+    changes = session.info.get("changes")
+    if changes:
+        invalidation_bus.before_commit(session, changes)
+
+@event.listens_for(Session, "after_commit")
+def _publish_commit(session):
+    if session.in_nested_transaction():
+        return
+    changes = session.info.pop("changes", None)
+    if changes:
+        invalidation_bus.publish(changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollback(session):
+    if not session.in_transaction():
+        session.info.pop("changes", None)
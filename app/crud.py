@@ -0,0 +1,184 @@
+from typing import Literal, Optional, Sequence
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy import ARRAY, Integer, any_, delete, insert, inspect, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from assets import add_asset_route
+from auth import get_current_user
+from bulk import add_bulk_route
+from cache import cached_route, related_tables
+from changes import record
+from database import engine, get_async_db
+from expand import expand_options, parse_expand, serialize_expanded
+from export import add_export_route
+from pagination import Page, paginate
+from serialization import fields_encoder, json_response, parse_fields, row_encoder, trimmed_schema
+
+MAX_IDS = 1000
+
+def parse_ids(ids: Optional[str]) -> list:
+    if not ids:
+        return []
+    try:
+        values = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma separated list of integers")
+    if len(values) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS} ids per request")
+    return values
+
+def ids_filter(column, ids):
+    # PostgreSQL : id = ANY($1) avec un seul paramètre tableau, même requête préparée quel que soit le nombre d'ids
+    if engine.dialect.name == "postgresql":
+        return column == any_(literal(ids, ARRAY(Integer)))
+    return column.in_(ids)
+
+def crud_router(
+    model,
+    create_schema,
+    out_schema,
+    *,
+    path: str,
+    singular: str,
+    plural: str,
+    label: str,
+    update_schema=None,
+    partial_update: bool = False,
+    sort_keys: Sequence[str] = ("id", "name"),
+    loaders: Sequence = (),
+    expand_schema=None,
+    expandable: Sequence[str] = (),
+    asset_fields: Sequence[str] = (),
+) -> APIRouter:
+    # Routes CRUD d'une entité : chaque écriture est un seul INSERT/UPDATE/DELETE ... RETURNING.
+    # get_current_user en dépendance du routeur : résolu (et la limite de débit vérifiée) avant get_async_db,
+    # donc avant de prendre une place de ADMISSION_LIMIT ; FastAPI réutilise ce résultat pour current_user
+    router = APIRouter(dependencies=[Depends(get_current_user)])
+    update_schema = update_schema or create_schema
+    not_found = f"{label} not found"
+    item_path = f"/{path}/{{{singular}_id}}"
+    SortKey = Literal[tuple(sort_keys)]
+    read_schema = expand_schema or out_schema
+    cached = cached_route(related_tables(model))
+    cached_item = cached_route(related_tables(model), model.__table__.name, f"{singular}_id")
+    # Chemin rapide des listes (sans expand) : colonnes Core + orjson, voir serialization.py
+    encoder = row_encoder(model, out_schema) if not loaders else None
+    expand_query = Query(None, include_in_schema=bool(expandable), description=f"Relations to embed, comma separated: {', '.join(expandable)}")
+    ids_query = Query(None, description=f"Comma separated ids to fetch in one query (at most {MAX_IDS})")
+    fields_query = Query(None, description=f"Fields to return, comma separated: {', '.join(out_schema.model_fields)}")
+    column_names = set(inspect(model).columns.keys())
+
+    # ?fields= : projection dans le SELECT. Colonnes seules -> select Core + orjson ;
+    # relations ou expand -> objets ORM avec load_only et un schéma réduit aux champs demandés
+    def projection(selected, names):
+        if names or any(name not in column_names for name in selected):
+            return None
+        return fields_encoder(model, out_schema, tuple(selected))
+
+    def projection_options(selected, names, *extra):
+        columns = [getattr(model, name) for name in selected if name in column_names]
+        relations = [name for name in selected if name not in column_names]
+        return [load_only(model.id, *extra, *columns), *expand_options(model, relations), *expand_options(model, names)]
+
+    def projected_item(obj, selected, names) -> dict:
+        return trimmed_schema(read_schema, tuple(selected + names)).model_validate(obj, from_attributes=True).model_dump(mode="json")
+
+    # /export et /bulk avant /{id} pour ne pas être pris pour un identifiant
+    add_export_route(router, path, model)
+    add_bulk_route(router, path, model, create_schema)
+
+    async def create_item(item: create_schema, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+        stmt = insert(model).values(**item.model_dump()).returning(model).options(*loaders)
+        db_item = (await db.scalars(stmt)).one()
+        record(db, model.__tablename__, (db_item.id,))
+        await db.commit()
+        return db_item
+
+    async def read_page(cursor: Optional[str] = None, limit: int = Query(10, ge=1, le=1000), sort: SortKey = "id", skip: Optional[int] = Query(None, deprecated=True), ids: Optional[str] = ids_query, expand: Optional[str] = expand_query, fields: Optional[str] = fields_query, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+        names = parse_expand(expand, expandable)
+        selected = parse_fields(fields, out_schema)
+        wanted = parse_ids(ids)
+        if wanted:
+            # Toutes les lignes demandées sur une seule page
+            limit, cursor, skip = len(wanted), None, None
+        where = [ids_filter(model.id, wanted)] if wanted else []
+        if selected:
+            sort_column = getattr(model, sort)
+            projected = projection(selected, names)
+            if projected is not None:
+                stmt = select(*projected.select_columns(model.id, sort_column)).where(*where)
+                return projected.page_response(await paginate(db, stmt, model, limit, cursor=cursor, sort=sort, skip=skip, scalars=False))
+            stmt = select(model).where(*where).options(*projection_options(selected, names, sort_column))
+            page = await paginate(db, stmt, model, limit, cursor=cursor, sort=sort, skip=skip)
+            return json_response({"items": [projected_item(item, selected, names) for item in page["items"]], "next_cursor": page["next_cursor"]})
+        if encoder is not None and not names:
+            stmt = select(*encoder.select_columns(model.id, getattr(model, sort))).where(*where)
+            return encoder.page_response(await paginate(db, stmt, model, limit, cursor=cursor, sort=sort, skip=skip, scalars=False))
+        stmt = select(model).where(*where).options(*loaders, *expand_options(model, names))
+        page = await paginate(db, stmt, model, limit, cursor=cursor, sort=sort, skip=skip)
+        if expand_schema is not None:
+            page["items"] = [serialize_expanded(item, out_schema, names) for item in page["items"]]
+        return page
+
+    async def read_item(item_id: int = Path(alias=f"{singular}_id"), expand: Optional[str] = expand_query, fields: Optional[str] = fields_query, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+        names = parse_expand(expand, expandable)
+        selected = parse_fields(fields, out_schema)
+        if selected:
+            projected = projection(selected, names)
+            if projected is not None:
+                row = (await db.execute(select(*projected.columns).where(model.id == item_id))).first()
+                if row is None:
+                    raise HTTPException(status_code=404, detail=not_found)
+                return projected.item_response(row)
+            db_item = await db.get(model, item_id, options=projection_options(selected, names))
+            if db_item is None:
+                raise HTTPException(status_code=404, detail=not_found)
+            return json_response(projected_item(db_item, selected, names))
+        db_item = await db.get(model, item_id, options=[*loaders, *expand_options(model, names)])
+        if db_item is None:
+            raise HTTPException(status_code=404, detail=not_found)
+        if expand_schema is not None:
+            return serialize_expanded(db_item, out_schema, names)
+        return db_item
+
+    async def update_item(item: update_schema, item_id: int = Path(alias=f"{singular}_id"), db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+        values = item.model_dump(exclude_none=partial_update)
+        if values:
+            stmt = update(model).where(model.id == item_id).values(**values).returning(model)
+        else:
+            stmt = select(model).where(model.id == item_id)
+        stmt = stmt.options(*loaders).execution_options(populate_existing=True, changed_ids=(item_id,))
+        db_item = (await db.scalars(stmt)).one_or_none()
+        if db_item is None:
+            raise HTTPException(status_code=404, detail=not_found)
+        await db.commit()
+        return db_item
+
+    async def delete_item(item_id: int = Path(alias=f"{singular}_id"), db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+        stmt = delete(model).where(model.id == item_id).returning(model.id).execution_options(changed_ids=(item_id,))
+        try:
+            deleted_id = (await db.execute(stmt)).scalar_one_or_none()
+        except IntegrityError:
+            # Ligne encore référencée par une clé étrangère (membres d'un équipage, îles d'une région...)
+            await db.rollback()
+            raise HTTPException(status_code=409, detail=f"{label} is still referenced and cannot be deleted")
+        if deleted_id is None:
+            raise HTTPException(status_code=404, detail=not_found)
+        await db.commit()
+        return {"detail": f"{label} deleted"}
+
+    create_item.__name__ = f"create_{singular}"
+    read_page.__name__ = f"read_{plural}"
+    read_item.__name__ = f"read_{singular}"
+    update_item.__name__ = f"update_{singular}"
+    delete_item.__name__ = f"delete_{singular}"
+
+    router.add_api_route(f"/{path}/", create_item, methods=["POST"], response_model=out_schema)
+    router.add_api_route(f"/{path}/", read_page, methods=["GET"], response_model=Page[read_schema], response_model_exclude_unset=expand_schema is not None, route_class_override=cached)
+    router.add_api_route(item_path, read_item, methods=["GET"], response_model=read_schema, response_model_exclude_unset=expand_schema is not None, route_class_override=cached_item)
+    router.add_api_route(item_path, update_item, methods=["PATCH" if partial_update else "PUT"], response_model=out_schema)
+    router.add_api_route(item_path, delete_item, methods=["DELETE"])
+    for field in asset_fields:
+        add_asset_route(router, item_path, singular, model, field, not_found)
+    return router
@@ -1,16 +1,313 @@
-from sqlalchemy import create_engine
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from fastapi import HTTPException, status
+from starlette.requests import Request
 
-DATABASE_URL = "postgresql://postgres:postgres@db/postgres"
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db/postgres")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1))
 
-engine = create_engine(DATABASE_URL, echo=True)
+# "async" : asyncpg sur la boucle d'événements, "sync" : psycopg2 sur le threadpool (pour comparer les deux)
+DB_MODE = os.getenv("DB_MODE", "async")
+
+def env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "true")
+DB_ECHO = env_flag("DB_ECHO", "false")
+
+# Requêtes plus lentes que SLOW_QUERY_MS journalisées, avec un échantillonnage SLOW_QUERY_SAMPLE_RATE (0 à 1)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+
+slow_query_logger = logging.getLogger("database.slow_query")
+
+class PoolWaitStats:
+    def __init__(self):
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds: float):
+        self.waits += 1
+        self.wait_total += seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.waits,
+            "wait_total_ms": round(self.wait_total * 1000, 3),
+            "wait_avg_ms": round(self.wait_total * 1000 / self.waits, 3) if self.waits else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "timeouts": self.timeouts,
+        }
+
+class RequestDbStats:
+    __slots__ = ("statements", "db_seconds", "pool_wait_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+# Compteurs de la requête HTTP en cours, posés par metrics.MetricsMiddleware (None hors requête)
+request_db_stats: ContextVar = ContextVar("request_db_stats", default=None)
+
+def record_pool_wait(wait_stats: PoolWaitStats, seconds: float):
+    wait_stats.record(seconds)
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+# _do_get est l'attente d'une connexion libre : on la chronomètre sans toucher au reste du pool
+class InstrumentedQueuePool(QueuePool):
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            record_pool_wait(self.wait_stats, time.perf_counter() - started)
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            record_pool_wait(self.wait_stats, time.perf_counter() - started)
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "echo": DB_ECHO,
+}
+
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms >= SLOW_QUERY_MS and random.random() < SLOW_QUERY_SAMPLE_RATE:
+        slow_query_logger.warning("slow query (%.1f ms): %s", elapsed_ms, statement)
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+
+# Requêtes HTTP qui tiennent une session : au-delà de ADMISSION_LIMIT on répond 503 tout de suite
+# plutôt que d'attendre une connexion jusqu'à DB_POOL_TIMEOUT (0 : pas de limite)
+ADMISSION_LIMIT = int(os.getenv("ADMISSION_LIMIT", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+ADMISSION_RETRY_AFTER = os.getenv("ADMISSION_RETRY_AFTER", "1")
+
+class AdmissionGate:
+    # Compteur sur la boucle d'événements (get_async_db est asynchrone) : pas de verrou
+    def __init__(self, limit: int = ADMISSION_LIMIT):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def enter(self):
+        if self.limit and self.in_flight >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Database busy, retry later",
+                headers={"Retry-After": ADMISSION_RETRY_AFTER},
+            )
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak = max(self.peak, self.in_flight)
+
+    def leave(self):
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "peak": self.peak, "admitted": self.admitted, "rejected": self.rejected}
+
+admission_gate = AdmissionGate()
+
+def pool_status() -> dict:
+    status = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        status[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+            **pool.wait_stats.as_dict(),
+        }
+    status["active"] = "sync" if DB_MODE == "sync" else "async"
+    return status
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+class ThreadedSession:
+    # Même interface qu'AsyncSession, mais chaque appel bloquant part sur le threadpool
+    def __init__(self, session):
+        self.sync_session = session
+
+    @property
+    def info(self):
+        return self.sync_session.info
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self._execute_buffered, statement, params, **kwargs)
+
+    def _execute_buffered(self, statement, params=None, **kwargs):
+        # Les lignes (et les chargements selectin) sont récupérées dans le thread, pas sur la boucle
+        result = self.sync_session.execute(statement, params, **kwargs)
+        if isinstance(result, CursorResult) and not result.returns_rows:
+            return result
+        return result.freeze()()
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def stream(self, statement, params=None, **kwargs):
+        statement = statement.execution_options(stream_results=True)
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+        return ThreadedStreamResult(result)
+
+    def begin_nested(self):
+        return ThreadedSavepoint(self.sync_session)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+class ThreadedStreamResult:
+    # Curseur côté serveur : chaque lot est lu sur le threadpool
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        partitions = self.result.partitions(size)
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                break
+            yield partition
+
+class ThreadedSavepoint:
+    def __init__(self, session):
+        self.session = session
+        self.transaction = None
+
+    async def __aenter__(self):
+        self.transaction = await run_in_threadpool(self.session.begin_nested)
+        return self.transaction
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await run_in_threadpool(self.transaction.commit)
+        else:
+            await run_in_threadpool(self.transaction.rollback)
+        return False
+
+def new_async_session():
+    if DB_MODE == "sync":
+        return ThreadedSession(SessionLocal(expire_on_commit=False))
+    return AsyncSessionLocal()
+
+@asynccontextmanager
+async def session_scope():
+    db = new_async_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+@asynccontextmanager
+async def admitted_session():
+    # Session d'une requête HTTP, comptée par admission_gate (503 au-delà de ADMISSION_LIMIT)
+    admission_gate.enter()
+    try:
+        async with session_scope() as db:
+            yield db
+    finally:
+        admission_gate.leave()
+
+async def get_async_db(request: Request):
+    # Sous-requêtes de /batch : session partagée, fermée par le batch
+    shared = getattr(request.state, "batch_db", None)
+    if shared is not None:
+        yield shared
+        return
+    async with admitted_session() as db:
+        yield db
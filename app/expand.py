@@ -0,0 +1,31 @@
+from typing import Optional, Sequence
+from fastapi import HTTPException
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+def parse_expand(expand: Optional[str], allowed: Sequence[str]) -> list:
+    if not expand:
+        return []
+    names = list(dict.fromkeys(name.strip() for name in expand.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand {', '.join(unknown)}; expandable relations: {', '.join(allowed) or 'none'}",
+        )
+    return names
+
+def expand_options(model, names: Sequence[str]) -> list:
+    # Many-to-one : jointure dans la même requête ; collections : une requête IN (...) par relation
+    relationships = inspect(model).relationships
+    return [
+        selectinload(getattr(model, name)) if relationships[name].uselist else joinedload(getattr(model, name))
+        for name in names
+    ]
+
+def serialize_expanded(obj, out_schema, names: Sequence[str]) -> dict:
+    # Les relations non demandées ne sont jamais lues : pas de lazy loading caché
+    data = out_schema.model_validate(obj, from_attributes=True).model_dump()
+    for name in names:
+        data[name] = getattr(obj, name)
+    return data
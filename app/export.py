@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+import os
+from typing import Literal
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from auth import get_current_user
+from database import admission_gate, session_scope
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+async def stream_partitions(table, batch_size: int = EXPORT_BATCH_SIZE):
+    # Session dédiée : elle doit vivre aussi longtemps que la réponse, pas seulement que la route
+    stmt = select(*table.columns).order_by(table.c.id).execution_options(yield_per=batch_size)
+    async with session_scope() as db:
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+async def ndjson_lines(table):
+    columns = [column.name for column in table.columns]
+    async for partition in stream_partitions(table):
+        yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in partition)
+
+async def csv_lines(table):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in table.columns])
+    async for partition in stream_partitions(table):
+        writer.writerows(partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+class AdmittedStreamingResponse(StreamingResponse):
+    # La place d'admission prise par la route est rendue à la fin du flux, même interrompu.
+    # Ici plutôt que dans le générateur : un générateur jamais démarré (client parti avant) ne passe pas par son finally
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission_gate.leave()
+
+def add_export_route(router: APIRouter, path: str, model):
+    table = model.__table__
+
+    async def export(format: Literal["ndjson", "csv"] = "ndjson", current_user: str = Depends(get_current_user)):
+        # Le flux tient une connexion du pool jusqu'au bout : 503 tout de suite si la base est saturée
+        admission_gate.enter()
+        if format == "csv":
+            return AdmittedStreamingResponse(
+                csv_lines(table),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="{table.name}.csv"'},
+            )
+        return AdmittedStreamingResponse(ndjson_lines(table), media_type="application/x-ndjson")
+
+    export.__name__ = f"export_{table.name}"
+    router.add_api_route(f"/{path}/export", export, methods=["GET"], response_class=StreamingResponse)
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import get_current_user
+from cache import cached_route
+from database import get_async_db
+from models import Boat, Character, Crew, Island, Manga, Region
+from schemas import MangaGraph
+
+# Nœuds : (modèle, colonnes renvoyées) ; arêtes : (nom, table source, colonne clé étrangère, table cible)
+NODES = {
+    "regions": (Region, ("id", "name")),
+    "islands": (Island, ("id", "name")),
+    "crews": (Crew, ("id", "name", "flag")),
+    "boats": (Boat, ("id", "name")),
+    "characters": (Character, ("id", "name", "strength")),
+}
+
+EDGES = (
+    ("region_islands", "islands", "region_id", "regions"),
+    ("region_characters", "characters", "region_id", "regions"),
+    ("island_characters", "characters", "island_id", "islands"),
+    ("crew_boats", "boats", "crew_id", "crews"),
+    ("crew_members", "characters", "crew_id", "crews"),
+)
+
+def foreign_keys(name: str) -> tuple:
+    return tuple(dict.fromkeys(column for _, source, column, _ in EDGES if source == name))
+
+router = APIRouter(dependencies=[Depends(get_current_user)], route_class=cached_route({Manga.__tablename__, *(model.__tablename__ for model, _ in NODES.values())}))
+
+@router.get("/mangas/{manga_id}/graph", response_model=MangaGraph)
+async def read_manga_graph(manga_id: int, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+    # Une requête par type de nœud (colonnes seulement, pas d'objets ORM) : 6 requêtes quelle que soit la taille
+    manga = (await db.execute(select(Manga.id, Manga.name).where(Manga.id == manga_id))).mappings().first()
+    if manga is None:
+        raise HTTPException(status_code=404, detail="Manga not found")
+    nodes = {}
+    keys = {}
+    for name, (model, columns) in NODES.items():
+        fks = foreign_keys(name)
+        stmt = select(*(getattr(model, column) for column in columns + fks)).where(model.manga_id == manga_id).order_by(model.id)
+        rows = (await db.execute(stmt)).all()
+        nodes[name] = {"columns": list(columns), "rows": [list(row[:len(columns)]) for row in rows]}
+        keys[name] = [(row[0], dict(zip(fks, row[len(columns):]))) for row in rows]
+    ids = {name: {row[0] for row in table["rows"]} for name, table in nodes.items()}
+    # Arêtes (parent, enfant) ; celles qui sortent du manga sont ignorées
+    edges = {
+        edge: [[fk_values[column], child_id] for child_id, fk_values in keys[source] if fk_values[column] in ids[target]]
+        for edge, source, column, target in EDGES
+    }
+    return {"manga": dict(manga), "nodes": nodes, "edges": edges}
@@ -0,0 +1,367 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+import time
+import uuid
+from typing import AsyncIterator, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import get_current_user
+from bulk import NDJSON_TYPES
+from changes import record
+from database import ThreadedSession, engine, get_async_db, session_scope
+from models import Character, Crew, DevilFruit, Haki, ImportCheckpoint, Island, Manga, Rank, Region, Weapon
+from schemas import ImportResult
+
+# Import de personnages dont les références (équipage, fruit, île, ...) sont données par leur nom :
+# lecture en flux, résolution par dictionnaires chargés une fois, références manquantes créées par lots,
+# écriture par COPY (PostgreSQL) ou INSERT multi-lignes, point de reprise validé avec chaque lot
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+READ_SIZE = 1 << 20
+
+# Champ de l'enregistrement -> modèle référencé (colonne <champ>_id de characters) ; region avant island
+REFERENCES = {
+    "crew": Crew,
+    "devil_fruit": DevilFruit,
+    "haki": Haki,
+    "weapon": Weapon,
+    "rank": Rank,
+    "region": Region,
+    "island": Island,
+}
+COLUMNS = ("name", "strength", "manga_id", *(f"{field}_id" for field in REFERENCES))
+REGION = list(REFERENCES).index("region")
+
+class InvalidRecord(ValueError):
+    pass
+
+################################################################ Lecture ################################################################
+
+async def decode(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="strict")
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+async def lines(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    pending = ""
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line
+    if pending:
+        yield pending
+
+async def ndjson_records(chunks: AsyncIterator[str]):
+    async for line in lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidRecord(f"Invalid JSON: {e}")
+
+async def json_array_records(chunks: AsyncIterator[str]):
+    # Tableau JSON d'objets lu élément par élément (raw_decode), sans charger tout le document
+    decoder = json.JSONDecoder()
+    buffer = ""
+    opened = closed = False
+    async for chunk in chunks:
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer) or closed:
+                break
+            if not opened:
+                if buffer[position] != "[":
+                    raise HTTPException(status_code=400, detail="Expected a JSON array of objects")
+                opened = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                closed = True
+                position += 1
+                continue
+            if buffer[position] != "{":
+                raise HTTPException(status_code=400, detail=f"Expected a JSON object at offset {position}")
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break
+            yield item
+        buffer = buffer[position:]
+    if not closed or buffer.strip():
+        raise HTTPException(status_code=400, detail="Invalid or truncated JSON array")
+
+async def csv_records(chunks: AsyncIterator[str]):
+    # Une ligne logique se termine quand le nombre de guillemets est pair (champs sur plusieurs lignes)
+    header = None
+    pending = []
+    quotes = 0
+    async for line in lines(chunks):
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        text = "\n".join(pending)
+        pending, quotes = [], 0
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield dict(zip(header, values))
+    if pending:
+        yield InvalidRecord("Unterminated quoted CSV field")
+
+RECORD_READERS = {"ndjson": ndjson_records, "json": json_array_records, "csv": csv_records}
+
+async def file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while True:
+            chunk = await run_in_threadpool(file.read, READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def detect_format(content_type: str, path: Optional[str] = None) -> str:
+    content_type = content_type.split(";")[0].strip()
+    if content_type in NDJSON_TYPES or (path or "").endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if content_type == "text/csv" or (path or "").endswith(".csv"):
+        return "csv"
+    return "json"
+
+################################################################ Import ################################################################
+
+def reference_name(record: dict, field: str) -> Optional[str]:
+    value = record.get(field)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    return value.strip() or None
+
+def parse_strength(value):
+    if value is None or value == "":
+        return None
+    try:
+        strength = float(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"Invalid strength {value!r}")
+    # Même contrainte que CharacterCreate (strength: int) : la colonne est un float
+    if not strength.is_integer():
+        raise InvalidRecord(f"strength must be an integer, not {value!r}")
+    return strength
+
+class Importer:
+    def __init__(self, db, manga_id: int, import_id: str):
+        self.db = db
+        self.manga_id = manga_id
+        self.import_id = import_id
+        self.lookups = {}
+        self.created = {field: 0 for field in REFERENCES}
+        self.errors = []
+        self.failed = 0
+        self.imported = 0
+        self.copy = engine.dialect.name == "postgresql"
+
+    async def load_lookups(self):
+        # Une requête par table de référence pour tout l'import ; à nom égal, la plus ancienne ligne l'emporte
+        for field, model in REFERENCES.items():
+            rows = await self.db.execute(select(model.name, model.id).where(model.manga_id == self.manga_id).order_by(model.id.desc()))
+            self.lookups[field] = dict(rows.all())
+
+    def fail(self, index: int, detail: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"index": index, "detail": detail})
+
+    async def create_missing(self, names: list):
+        # Références inconnues du lot créées en un INSERT multi-lignes par table ;
+        # les régions passent avant les îles, dont la région est alors déjà connue
+        regions = self.lookups["region"]
+        for position, (field, model) in enumerate(REFERENCES.items()):
+            lookup = self.lookups[field]
+            missing = {}
+            for references in names:
+                name = references[position]
+                if name is not None and name not in lookup and name not in missing:
+                    missing[name] = {"name": name, "manga_id": self.manga_id}
+                    if model is Island:
+                        missing[name]["region_id"] = regions.get(references[REGION])
+            if not missing:
+                continue
+            stmt = insert(model).returning(model.name, model.id, sort_by_parameter_order=True)
+            result = await self.db.execute(stmt, list(missing.values()))
+            lookup.update(result.all())
+            self.created[field] += len(missing)
+            record(self.db, model.__tablename__)
+
+    def rows(self, records: list, names: list) -> list:
+        lookups = [self.lookups[field] for field in REFERENCES]
+        rows = []
+        for (index, item), references in zip(records, names):
+            try:
+                name = item.get("name")
+                if not isinstance(name, str) or not name.strip():
+                    raise InvalidRecord("name is required")
+                ids = [lookup.get(reference) for lookup, reference in zip(lookups, references)]
+                rows.append((name.strip(), parse_strength(item.get("strength")), self.manga_id, *ids))
+            except InvalidRecord as e:
+                self.fail(index, str(e))
+        return rows
+
+    async def write(self, rows: list):
+        if not rows:
+            return
+        if not self.copy:
+            await self.db.execute(insert(Character.__table__), [dict(zip(COLUMNS, row)) for row in rows])
+        elif isinstance(self.db, ThreadedSession):
+            await run_in_threadpool(copy_psycopg2, self.db.sync_session, rows)
+        else:
+            # COPY binaire d'asyncpg, sur la connexion (et dans la transaction) de la session
+            connection = await self.db.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(Character.__tablename__, records=rows, columns=COLUMNS)
+        record(self.db, Character.__tablename__)
+
+    async def run_chunk(self, records: list, position: int):
+        # Noms normalisés une fois par enregistrement, dans l'ordre de REFERENCES
+        names = [tuple(reference_name(item, field) for field in REFERENCES) for _, item in records]
+        await self.create_missing(names)
+        rows = self.rows(records, names)
+        # Le point de reprise avance dans la même transaction que les lignes : un lot est importé une seule fois
+        await self.db.execute(
+            update(ImportCheckpoint)
+            .where(ImportCheckpoint.id == self.import_id)
+            .values(position=position, imported=ImportCheckpoint.imported + len(rows))
+        )
+        await self.write(rows)
+        await self.db.commit()
+        self.imported += len(rows)
+
+def copy_psycopg2(session, rows: list):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with session.connection().connection.dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {Character.__tablename__} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+async def get_or_create_manga(db, name: str) -> int:
+    manga_id = await db.scalar(select(Manga.id).where(Manga.name == name))
+    if manga_id is None:
+        manga_id = (await db.execute(insert(Manga).values(name=name).returning(Manga.id))).scalar_one()
+        record(db, Manga.__tablename__, (manga_id,))
+        await db.commit()
+    return manga_id
+
+async def run_import(db, records, manga: str, import_id: Optional[str] = None, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    started = time.perf_counter()
+    import_id = import_id or uuid.uuid4().hex
+    manga_id = await get_or_create_manga(db, manga)
+    checkpoint = (await db.execute(select(ImportCheckpoint.manga_id, ImportCheckpoint.position).where(ImportCheckpoint.id == import_id))).first()
+    if checkpoint is None:
+        await db.execute(insert(ImportCheckpoint).values(id=import_id, manga_id=manga_id, position=0, imported=0))
+        await db.commit()
+        resumed_from = 0
+    elif checkpoint.manga_id != manga_id:
+        raise HTTPException(status_code=409, detail=f"Import {import_id} belongs to another manga")
+    else:
+        resumed_from = checkpoint.position
+
+    importer = Importer(db, manga_id, import_id)
+    await importer.load_lookups()
+    # Reprise : les `resumed_from` premiers enregistrements sont déjà en base, on les relit sans les traiter
+    batch = []
+    position = 0
+    async for item in records:
+        position += 1
+        if position <= resumed_from:
+            continue
+        if isinstance(item, InvalidRecord):
+            importer.fail(position - 1, str(item))
+        elif not isinstance(item, dict):
+            importer.fail(position - 1, "Expected an object")
+        else:
+            batch.append((position - 1, item))
+        if len(batch) >= chunk_size:
+            await importer.run_chunk(batch, position)
+            batch = []
+    if position > resumed_from:
+        await importer.run_chunk(batch, position)
+
+    seconds = time.perf_counter() - started
+    return {
+        "import_id": import_id,
+        "manga_id": manga_id,
+        "resumed_from": resumed_from,
+        "processed": max(position - resumed_from, 0),
+        "imported": importer.imported,
+        "failed": importer.failed,
+        "created": {field: count for field, count in importer.created.items() if count},
+        "errors": importer.errors,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(importer.imported / seconds, 1) if seconds else 0.0,
+    }
+
+router = APIRouter(dependencies=[Depends(get_current_user)])
+
+IMPORT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/x-ndjson": {"schema": {"type": "string"}},
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            "text/csv": {"schema": {"type": "string"}},
+        },
+    }
+}
+
+@router.post("/import", response_model=ImportResult, openapi_extra=IMPORT_OPENAPI)
+async def import_characters(
+    request: Request,
+    manga: str = Query(..., description="Manga name, created if missing"),
+    format: Optional[Literal["ndjson", "json", "csv"]] = Query(None, description="Defaults to the Content-Type"),
+    import_id: Optional[str] = Query(None, description="Resume an earlier import from its checkpoint"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: str = Depends(get_current_user),
+):
+    # Corps lu en flux : mémoire bornée par IMPORT_CHUNK_SIZE, pas par la taille du fichier
+    reader = RECORD_READERS[format or detect_format(request.headers.get("content-type", ""))]
+    try:
+        return await run_import(db, reader(decode(request.stream())), manga, import_id)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8: {e}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import characters whose crews, devil fruits, islands... are given by name")
+    parser.add_argument("path")
+    parser.add_argument("--manga", required=True)
+    parser.add_argument("--format", choices=sorted(RECORD_READERS))
+    parser.add_argument("--import-id", help="reprend un import interrompu (par défaut : nom du fichier)")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    reader = RECORD_READERS[args.format or detect_format("", args.path)]
+    import_id = args.import_id or os.path.abspath(args.path)
+    async with session_scope() as db:
+        result = await run_import(db, reader(decode(file_chunks(args.path))), args.manga, import_id, args.chunk_size)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    asyncio.run(main())
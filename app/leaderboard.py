@@ -0,0 +1,176 @@
+import asyncio
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import get_current_user
+from bus import invalidation_bus
+from database import get_async_db
+from models import Character
+from schemas import Leaderboard
+
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "100"))
+LEADERBOARD_BOARDS = int(os.getenv("LEADERBOARD_BOARDS", "512"))
+# Au-delà, on oublie tout plutôt que de relire autant de lignes
+LEADERBOARD_MAX_PENDING = int(os.getenv("LEADERBOARD_MAX_PENDING", "10000"))
+
+COLUMNS = (Character.id, Character.name, Character.strength, Character.manga_id, Character.crew_id, Character.rank_id)
+FILTERS = ("manga_id", "crew_id", "rank_id")
+
+def sort_key(row) -> tuple:
+    # strength DESC, id ASC : même ordre que l'index (manga_id, strength DESC NULLS LAST, id)
+    return (-row["strength"], row["id"])
+
+class Board:
+    # Les `size` meilleurs personnages d'un filtre (manga, équipage, rang), triés.
+    # complete : la board contient toutes les lignes du filtre, pas seulement le début du classement.
+    def __init__(self, scope: tuple, rows, size: int):
+        self.scope = scope
+        self.size = size
+        self.rows = list(rows)
+        self.keys = [sort_key(row) for row in self.rows]
+        self.complete = len(self.rows) < size
+
+    def matches(self, row) -> bool:
+        return row["strength"] is not None and all(value is None or row[name] == value for name, value in zip(FILTERS, self.scope))
+
+    def remove(self, row_id: int):
+        for position, row in enumerate(self.rows):
+            if row["id"] == row_id:
+                del self.rows[position]
+                del self.keys[position]
+                return
+
+    def insert(self, row):
+        key = sort_key(row)
+        # Sous la dernière ligne d'une board incomplète, la place réelle est inconnue
+        if not self.complete and (not self.keys or key > self.keys[-1]):
+            return
+        position = bisect.bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.rows.insert(position, row)
+        if len(self.rows) > self.size:
+            del self.rows[self.size:]
+            del self.keys[self.size:]
+            self.complete = False
+
+    def top(self, k: int) -> Optional[list]:
+        # None : la board a perdu trop de lignes (suppressions) pour répondre, il faut la relire
+        if len(self.rows) < k and not self.complete:
+            return None
+        return self.rows[:k]
+
+class LeaderboardIndex:
+    # Classements en mémoire, mis à jour ligne par ligne à partir des événements du bus :
+    # seules les lignes modifiées sont relues (par clé primaire), jamais toute la table
+    def __init__(self, size: int = LEADERBOARD_SIZE, max_boards: int = LEADERBOARD_BOARDS, max_pending: int = LEADERBOARD_MAX_PENDING):
+        self.size = size
+        self.max_boards = max_boards
+        self.max_pending = max_pending
+        self.hits = 0
+        self.loads = 0
+        self.updates = 0
+        self.resets = 0
+        self._boards = OrderedDict()
+        self._pending = set()
+        self._reset = False
+        # on_change peut être appelé depuis le threadpool (DB_MODE=sync)
+        self._pending_lock = threading.Lock()
+        self._lock = asyncio.Lock()
+
+    def on_change(self, table, ids):
+        if table is not None and table != Character.__tablename__:
+            return
+        with self._pending_lock:
+            if table is None or ids is None or not ids or len(self._pending) + len(ids) > self.max_pending:
+                # Ids inconnus (ou trop nombreux) : toutes les boards seront relues à la demande
+                self._reset = True
+                self._pending.clear()
+            else:
+                self._pending.update(ids)
+
+    def _take_pending(self):
+        with self._pending_lock:
+            reset, pending = self._reset, self._pending
+            self._reset, self._pending = False, set()
+        return reset, pending
+
+    async def _apply_pending(self, db: AsyncSession):
+        reset, pending = self._take_pending()
+        if reset:
+            self._boards.clear()
+            self.resets += 1
+        if not pending or not self._boards:
+            return
+        try:
+            rows = (await db.execute(select(*COLUMNS).where(Character.id.in_(pending)))).mappings().all()
+        except BaseException:
+            # Lignes non relues : les boards ne sont plus fiables
+            self.on_change(None, None)
+            raise
+        for board in self._boards.values():
+            for row_id in pending:
+                board.remove(row_id)
+            for row in rows:
+                if board.matches(row):
+                    board.insert(dict(row))
+        self.updates += len(pending)
+
+    async def _load(self, db: AsyncSession, scope: tuple) -> Board:
+        stmt = select(*COLUMNS).where(Character.strength.is_not(None))
+        for column, value in zip(FILTERS, scope):
+            if value is not None:
+                stmt = stmt.where(getattr(Character, column) == value)
+        stmt = stmt.order_by(Character.strength.desc().nulls_last(), Character.id).limit(self.size)
+        rows = (await db.execute(stmt)).mappings().all()
+        self.loads += 1
+        board = Board(scope, [dict(row) for row in rows], self.size)
+        self._boards[scope] = board
+        while len(self._boards) > self.max_boards:
+            self._boards.popitem(last=False)
+        return board
+
+    async def top(self, db: AsyncSession, k: int, manga_id=None, crew_id=None, rank_id=None) -> list:
+        scope = (manga_id, crew_id, rank_id)
+        # Sérialisé : une relecture en cours ne peut pas écraser une mise à jour plus récente
+        async with self._lock:
+            await self._apply_pending(db)
+            board = self._boards.get(scope)
+            rows = board.top(k) if board is not None else None
+            if rows is None:
+                rows = (await self._load(db, scope)).top(k)
+            else:
+                self._boards.move_to_end(scope)
+                self.hits += 1
+            return rows
+
+    def stats(self) -> dict:
+        return {
+            "boards": len(self._boards),
+            "max_boards": self.max_boards,
+            "size": self.size,
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "loads": self.loads,
+            "updates": self.updates,
+            "resets": self.resets,
+        }
+
+leaderboard_index = LeaderboardIndex()
+invalidation_bus.subscribe(leaderboard_index.on_change)
+
+router = APIRouter(dependencies=[Depends(get_current_user)])
+
+@router.get("/leaderboard", response_model=Leaderboard)
+async def read_leaderboard(manga_id: Optional[int] = None, crew_id: Optional[int] = None, rank_id: Optional[int] = None, k: int = Query(10, ge=1, le=LEADERBOARD_SIZE), db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+    rows = await leaderboard_index.top(db, k, manga_id, crew_id, rank_id)
+    return {
+        "manga_id": manga_id,
+        "crew_id": crew_id,
+        "rank_id": rank_id,
+        "items": [{"position": position, **row} for position, row in enumerate(rows, 1)],
+    }
@@ -0,0 +1,160 @@
+import time
+from bisect import bisect_left
+from fastapi import APIRouter, Response
+from database import RequestDbStats, env_flag, pool_status, request_db_stats
+
+# Métriques Prometheus par route : une entrée par (méthode, chemin déclaré), jamais par URL brute
+METRICS = env_flag("METRICS", "true")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # Compte du seul bucket atteint ; les cumuls "le" sont calculés à l'export
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: str):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+class RouteMetrics:
+    __slots__ = ("statuses", "duration", "statements", "db_time", "pool_wait")
+
+    def __init__(self):
+        self.statuses = {}
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram(DB_TIME_BUCKETS)
+        self.pool_wait = 0.0
+
+class RequestMetrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self._routes = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestDbStats):
+        # Appelé sur la boucle d'événements en fin de requête : pas de verrou
+        key = (method, route)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            metrics = self._routes[key] = RouteMetrics()
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        metrics.duration.observe(seconds)
+        metrics.statements.observe(stats.statements)
+        metrics.db_time.observe(stats.db_seconds)
+        metrics.pool_wait += stats.pool_wait_seconds
+
+    def render(self) -> str:
+        lines = []
+        routes = sorted(self._routes.items())
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("http_requests_total", "counter", "HTTP requests by route and status code.")
+        for (method, route), metrics in routes:
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f"http_requests_total{{{route_labels(method, route)},status=\"{status}\"}} {count}")
+        for name, attribute, help_text in (
+            ("http_request_duration_seconds", "duration", "Time to serve the request, response body included."),
+            ("http_request_db_statements", "statements", "SQL statements executed per request."),
+            ("http_request_db_duration_seconds", "db_time", "Time spent executing SQL statements per request."),
+        ):
+            family(name, "histogram", help_text)
+            for (method, route), metrics in routes:
+                lines.extend(getattr(metrics, attribute).samples(name, route_labels(method, route)))
+        family("http_request_db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection.")
+        for (method, route), metrics in routes:
+            lines.append(f"http_request_db_pool_wait_seconds_total{{{route_labels(method, route)}}} {metrics.pool_wait}")
+
+        pool = pool_status()
+        active = pool[pool["active"]]
+        for name, key, kind, help_text in (
+            ("db_pool_size", "size", "gauge", "Configured pool size."),
+            ("db_pool_checked_out", "checked_out", "gauge", "Connections currently checked out."),
+            ("db_pool_idle", "idle", "gauge", "Idle connections in the pool."),
+            ("db_pool_overflow", "overflow", "gauge", "Connections opened beyond the pool size."),
+            ("db_pool_checkouts_total", "checkouts", "counter", "Connection checkouts."),
+            ("db_pool_timeouts_total", "timeouts", "counter", "Checkouts that timed out waiting for a connection."),
+        ):
+            family(name, kind, help_text)
+            lines.append(f'{name}{{mode="{pool["active"]}"}} {active[key]}')
+        family("db_pool_wait_seconds_total", "counter", "Total time spent waiting for a pooled connection.")
+        lines.append(f'db_pool_wait_seconds_total{{mode="{pool["active"]}"}} {active["wait_total_ms"] / 1000}')
+        family("process_start_time_seconds", "gauge", "Start time of the process since the Unix epoch.")
+        lines.append(f"process_start_time_seconds {self.started_at}")
+        return "\n".join(lines) + "\n"
+
+def route_label(scope) -> str:
+    # Chemin déclaré de la route choisie, préfixe des routeurs inclus compris (la route ne connaît que son propre chemin)
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope["path"]
+    start = 0
+    while start >= 0:
+        if route.path_regex.match(path[start:]):
+            return path[:start] + template
+        start = path.find("/", start + 1)
+    return template
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def route_labels(method: str, route: str) -> str:
+    return f'method="{method}",route="{escape_label(route)}"'
+
+request_metrics = RequestMetrics()
+
+class MetricsMiddleware:
+    # Middleware ASGI pur (pas BaseHTTPMiddleware) : ni tâche ni copie du corps en plus par requête
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_db_stats.reset(token)
+            self.metrics.observe(scope["method"], route_label(scope), status, time.perf_counter() - started, stats)
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    # Format texte Prometheus, sans authentification pour le scraper ; sur la boucle, comme observe()
+    return Response(request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
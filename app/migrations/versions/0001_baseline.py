@@ -0,0 +1,64 @@
+"""Schéma initial (tel que créé auparavant par create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Chaque table a un id et un name indexés
+def named_table(name, *columns, unique_name=False):
+    op.create_table(
+        name,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        *columns,
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(f"ix_{name}_id", name, ["id"])
+    op.create_index(f"ix_{name}_name", name, ["name"], unique=unique_name)
+
+def manga_fk():
+    return sa.Column("manga_id", sa.Integer(), sa.ForeignKey("manga.id"), nullable=True)
+
+def upgrade():
+    named_table(
+        "users",
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        unique_name=True,
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    named_table("manga", sa.Column("image", sa.String(), nullable=True), unique_name=True)
+    named_table("devil_fruit_types")
+    named_table("haki_types")
+    named_table("devil_fruits", sa.Column("type_id", sa.Integer(), sa.ForeignKey("devil_fruit_types.id"), nullable=True), manga_fk())
+    named_table("weapons", manga_fk())
+    named_table("haki", sa.Column("type_id", sa.Integer(), sa.ForeignKey("haki_types.id"), nullable=True), manga_fk())
+    named_table("ranks", manga_fk())
+    named_table("regions", manga_fk())
+    named_table("islands", sa.Column("region_id", sa.Integer(), sa.ForeignKey("regions.id"), nullable=True), manga_fk())
+    named_table("crews", sa.Column("flag", sa.String(), nullable=True), manga_fk())
+    named_table("boats", sa.Column("crew_id", sa.Integer(), sa.ForeignKey("crews.id"), nullable=True), manga_fk())
+    named_table(
+        "characters",
+        sa.Column("strength", sa.Float(), nullable=True),
+        sa.Column("devil_fruit_id", sa.Integer(), sa.ForeignKey("devil_fruits.id"), nullable=True),
+        sa.Column("crew_id", sa.Integer(), sa.ForeignKey("crews.id"), nullable=True),
+        sa.Column("haki_id", sa.Integer(), sa.ForeignKey("haki.id"), nullable=True),
+        sa.Column("weapon_id", sa.Integer(), sa.ForeignKey("weapons.id"), nullable=True),
+        sa.Column("rank_id", sa.Integer(), sa.ForeignKey("ranks.id"), nullable=True),
+        sa.Column("island_id", sa.Integer(), sa.ForeignKey("islands.id"), nullable=True),
+        sa.Column("region_id", sa.Integer(), sa.ForeignKey("regions.id"), nullable=True),
+        manga_fk(),
+    )
+
+def downgrade():
+    for name in ("characters", "boats", "crews", "islands", "regions", "ranks", "haki", "weapons", "devil_fruits", "haki_types", "devil_fruit_types", "manga", "users"):
+        op.drop_table(name)
@@ -0,0 +1,56 @@
+"""Plan d'index : clés étrangères, (manga_id, strength) et trigrammes sur name
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+FK_INDEXES = {
+    "characters": ("devil_fruit_id", "crew_id", "haki_id", "weapon_id", "rank_id", "island_id", "region_id"),
+    "devil_fruits": ("type_id", "manga_id"),
+    "weapons": ("manga_id",),
+    "haki": ("type_id", "manga_id"),
+    "boats": ("crew_id", "manga_id"),
+    "crews": ("manga_id",),
+    "islands": ("region_id", "manga_id"),
+    "regions": ("manga_id",),
+    "ranks": ("manga_id",),
+}
+
+TRGM_TABLES = ("manga", "characters", "devil_fruits", "weapons", "haki", "boats", "crews", "islands", "regions", "ranks")
+
+def is_postgresql():
+    return op.get_context().dialect.name == "postgresql"
+
+def upgrade():
+    if is_postgresql():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY : pas de verrou d'écriture sur des tables déjà peuplées, mais hors transaction.
+    # IF NOT EXISTS : les index trigrammes ont pu être créés par l'ancien create_all.
+    with op.get_context().autocommit_block():
+        for table, columns in FK_INDEXES.items():
+            for column in columns:
+                op.create_index(f"ix_{table}_{column}", table, [column], postgresql_concurrently=True, if_not_exists=True)
+        # Sert aussi d'index simple sur characters.manga_id (colonne de tête)
+        op.create_index("ix_characters_manga_id_strength", "characters", ["manga_id", "strength"], postgresql_concurrently=True, if_not_exists=True)
+        for table in TRGM_TABLES if is_postgresql() else ():
+            op.create_index(
+                f"ix_{table}_name_trgm", table, ["name"],
+                postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in TRGM_TABLES if is_postgresql() else ():
+            op.drop_index(f"ix_{table}_name_trgm", table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_characters_manga_id_strength", table_name="characters", postgresql_concurrently=True, if_exists=True)
+        for table, columns in FK_INDEXES.items():
+            for column in columns:
+                op.drop_index(f"ix_{table}_{column}", table_name=table, postgresql_concurrently=True, if_exists=True)
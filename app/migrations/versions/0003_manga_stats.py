@@ -0,0 +1,76 @@
+"""Statistiques par manga : vues matérialisées manga_stats, manga_crew_counts, manga_rank_counts
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# refreshed_at = now() : début de la transaction de REFRESH, identique pour les trois vues
+MANGA_STATS = """
+CREATE MATERIALIZED VIEW manga_stats AS
+SELECT
+    m.id AS manga_id,
+    coalesce(c.characters, 0) AS characters,
+    coalesce(cr.crews, 0) AS crews,
+    coalesce(i.islands, 0) AS islands,
+    coalesce(df.devil_fruits, 0) AS devil_fruits,
+    c.strength_avg,
+    c.strength_min,
+    c.strength_max,
+    c.strength_p50,
+    c.strength_p90,
+    c.strength_p99,
+    now() AS refreshed_at
+FROM manga m
+LEFT JOIN (
+    SELECT
+        manga_id,
+        count(*) AS characters,
+        avg(strength) AS strength_avg,
+        min(strength) AS strength_min,
+        max(strength) AS strength_max,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY strength) AS strength_p50,
+        percentile_cont(0.9) WITHIN GROUP (ORDER BY strength) AS strength_p90,
+        percentile_cont(0.99) WITHIN GROUP (ORDER BY strength) AS strength_p99
+    FROM characters
+    GROUP BY manga_id
+) c ON c.manga_id = m.id
+LEFT JOIN (SELECT manga_id, count(*) AS crews FROM crews GROUP BY manga_id) cr ON cr.manga_id = m.id
+LEFT JOIN (SELECT manga_id, count(*) AS islands FROM islands GROUP BY manga_id) i ON i.manga_id = m.id
+LEFT JOIN (SELECT manga_id, count(*) AS devil_fruits FROM devil_fruits GROUP BY manga_id) df ON df.manga_id = m.id
+"""
+
+# Les personnages sans équipage / sans rang ne sont comptés que dans manga_stats.characters
+GROUP_COUNTS = """
+CREATE MATERIALIZED VIEW manga_{group}_counts AS
+SELECT c.manga_id, c.{group}_id, g.name, count(*) AS characters
+FROM characters c
+JOIN {table} g ON g.id = c.{group}_id
+WHERE c.manga_id IS NOT NULL
+GROUP BY c.manga_id, c.{group}_id, g.name
+"""
+
+def is_postgresql():
+    return op.get_context().dialect.name == "postgresql"
+
+def upgrade():
+    if not is_postgresql():
+        return
+    op.execute(MANGA_STATS)
+    # Index uniques : requis par REFRESH MATERIALIZED VIEW CONCURRENTLY (lectures jamais bloquées)
+    op.execute("CREATE UNIQUE INDEX ix_manga_stats_manga_id ON manga_stats (manga_id)")
+    for group, table in (("crew", "crews"), ("rank", "ranks")):
+        op.execute(GROUP_COUNTS.format(group=group, table=table))
+        op.execute(f"CREATE UNIQUE INDEX ix_manga_{group}_counts_key ON manga_{group}_counts (manga_id, {group}_id)")
+
+def downgrade():
+    if not is_postgresql():
+        return
+    for name in ("manga_rank_counts", "manga_crew_counts", "manga_stats"):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name}")
@@ -0,0 +1,30 @@
+"""Index de classement (manga_id, strength DESC NULLS LAST, id) sur characters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Remplace (manga_id, strength) : le parcours à l'envers donnerait NULLS FIRST et un tri supplémentaire.
+    # SQLite refuse NULLS LAST dans un index, mais y range déjà les NULL en dernier avec DESC.
+    strength = "strength DESC NULLS LAST" if op.get_context().dialect.name == "postgresql" else "strength DESC"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_characters_manga_id_strength_desc", "characters",
+            ["manga_id", sa.text(strength), "id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index("ix_characters_manga_id_strength", table_name="characters", postgresql_concurrently=True, if_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_characters_manga_id_strength", "characters", ["manga_id", "strength"], postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index("ix_characters_manga_id_strength_desc", table_name="characters", postgresql_concurrently=True, if_exists=True)
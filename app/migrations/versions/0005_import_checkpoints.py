@@ -0,0 +1,27 @@
+"""Points de reprise des imports en masse (importer.py)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "import_checkpoints",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("manga_id", sa.Integer(), sa.ForeignKey("manga.id"), nullable=True),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("imported", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+def downgrade():
+    op.drop_table("import_checkpoints")
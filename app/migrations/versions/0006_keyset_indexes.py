@@ -0,0 +1,39 @@
+"""Index (clé de tri, id) pour la pagination par curseur des routes CRUD
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# sort_keys des crud_router de main.py ("id" a déjà sa clé primaire)
+KEYSET_INDEXES = {
+    "manga": ("name",),
+    "characters": ("name", "strength"),
+    "devil_fruits": ("name",),
+    "weapons": ("name",),
+    "haki": ("name",),
+    "boats": ("name",),
+    "crews": ("name",),
+    "islands": ("name",),
+    "regions": ("name",),
+    "ranks": ("name",),
+}
+
+def upgrade():
+    # Une page profonde devient un parcours d'intervalle de l'index, sans tri (voir pagination.keyset_phases)
+    with op.get_context().autocommit_block():
+        for table, columns in KEYSET_INDEXES.items():
+            for column in columns:
+                op.create_index(f"ix_{table}_{column}_id", table, [column, "id"], postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table, columns in KEYSET_INDEXES.items():
+            for column in columns:
+                op.drop_index(f"ix_{table}_{column}_id", table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float
+from sqlalchemy import Column, DateTime, Integer, Index, String, ForeignKey, Float, func
 from database import Base
 from auth import get_password_hash, verify_password
 from sqlalchemy.orm import relationship
 
+# Recherche floue : index GIN trigramme sur les noms (extension pg_trgm créée par la migration 0002)
+def name_trgm_index(table_name: str) -> Index:
+    return Index(f"ix_{table_name}_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"})
+
+# Pagination par curseur : (clé de tri, id) pour chaque sort_keys des routes CRUD (migration 0006)
+def keyset_index(table_name: str, column: str) -> Index:
+    return Index(f"ix_{table_name}_{column}_id", column, "id")
+
 ################################################################ Users ################################################################
 
 class User(Base):
@@ -23,6 +31,7 @@ class User(Base):
 
 class Manga(Base):
     __tablename__ = "manga"
+    __table_args__ = (name_trgm_index("manga"), keyset_index("manga", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
@@ -42,17 +51,18 @@ class Manga(Base):
 
 class Character(Base):
     __tablename__ = "characters"
+    __table_args__ = (name_trgm_index("characters"), keyset_index("characters", "name"), keyset_index("characters", "strength"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     strength = Column(Float)
-    devil_fruit_id = Column(Integer, ForeignKey('devil_fruits.id'))
-    crew_id = Column(Integer, ForeignKey('crews.id'))
-    haki_id = Column(Integer, ForeignKey('haki.id'))
-    weapon_id = Column(Integer, ForeignKey('weapons.id'))
-    rank_id = Column(Integer, ForeignKey('ranks.id'))
-    island_id = Column(Integer, ForeignKey('islands.id'))
-    region_id = Column(Integer, ForeignKey('regions.id'))
+    devil_fruit_id = Column(Integer, ForeignKey('devil_fruits.id'), index=True)
+    crew_id = Column(Integer, ForeignKey('crews.id'), index=True)
+    haki_id = Column(Integer, ForeignKey('haki.id'), index=True)
+    weapon_id = Column(Integer, ForeignKey('weapons.id'), index=True)
+    rank_id = Column(Integer, ForeignKey('ranks.id'), index=True)
+    island_id = Column(Integer, ForeignKey('islands.id'), index=True)
+    region_id = Column(Integer, ForeignKey('regions.id'), index=True)
     manga_id = Column(Integer, ForeignKey('manga.id'))
 
     devil_fruit = relationship("DevilFruit", back_populates="characters")
@@ -64,15 +74,19 @@ class Character(Base):
     region = relationship("Region", back_populates="characters")
     manga = relationship("Manga", back_populates="characters")
 
+# Classements : parcours dans l'ordre de l'index, sans tri. Sert aussi de simple index sur manga_id (colonne de tête)
+Index("ix_characters_manga_id_strength_desc", Character.manga_id, Character.strength.desc().nulls_last(), Character.id)
+
 ################################################################ Devil Fruits ################################################################
 
 class DevilFruit(Base):
     __tablename__ = "devil_fruits"
+    __table_args__ = (name_trgm_index("devil_fruits"), keyset_index("devil_fruits", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    type_id = Column(Integer, ForeignKey('devil_fruit_types.id'))
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    type_id = Column(Integer, ForeignKey('devil_fruit_types.id'), index=True)
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     type = relationship("DevilFruitType", back_populates="fruits")
     characters = relationship("Character", back_populates="devil_fruit")
@@ -90,10 +104,11 @@ class DevilFruitType(Base):
 
 class Weapon(Base):
     __tablename__ = "weapons"
+    __table_args__ = (name_trgm_index("weapons"), keyset_index("weapons", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     users = relationship("Character", back_populates="weapon")
     manga = relationship("Manga", back_populates="weapons")
@@ -102,11 +117,12 @@ class Weapon(Base):
 
 class Haki(Base):
     __tablename__ = "haki"
+    __table_args__ = (name_trgm_index("haki"), keyset_index("haki", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
-    type_id = Column(Integer, ForeignKey('haki_types.id'))
+    type_id = Column(Integer, ForeignKey('haki_types.id'), index=True)
     name = Column(String, index=True)
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     type = relationship("HakiType", back_populates="haki")
     users = relationship("Character", back_populates="haki")
@@ -124,11 +140,12 @@ class HakiType(Base):
 
 class Boat(Base):
     __tablename__ = "boats"
+    __table_args__ = (name_trgm_index("boats"), keyset_index("boats", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    crew_id = Column(Integer, ForeignKey('crews.id'))
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    crew_id = Column(Integer, ForeignKey('crews.id'), index=True)
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     crew = relationship("Crew", back_populates="boats")
     manga = relationship("Manga", back_populates="boats")
@@ -137,11 +154,12 @@ class Boat(Base):
 
 class Crew(Base):
     __tablename__ = "crews"
+    __table_args__ = (name_trgm_index("crews"), keyset_index("crews", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     flag = Column(String)
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     boats = relationship("Boat", back_populates="crew")
     members = relationship("Character", back_populates="crew")
@@ -151,11 +169,12 @@ class Crew(Base):
 
 class Island(Base):
     __tablename__ = "islands"
+    __table_args__ = (name_trgm_index("islands"), keyset_index("islands", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    region_id = Column(Integer, ForeignKey('regions.id'))
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    region_id = Column(Integer, ForeignKey('regions.id'), index=True)
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     region = relationship("Region", back_populates="islands")
     characters = relationship("Character", back_populates="island")
@@ -165,10 +184,11 @@ class Island(Base):
 
 class Region(Base):
     __tablename__ = "regions"
+    __table_args__ = (name_trgm_index("regions"), keyset_index("regions", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     islands = relationship("Island", back_populates="region")
     characters = relationship("Character", back_populates="region")
@@ -178,10 +198,23 @@ class Region(Base):
 
 class Rank(Base):
     __tablename__ = "ranks"
+    __table_args__ = (name_trgm_index("ranks"), keyset_index("ranks", "name"))
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    manga_id = Column(Integer, ForeignKey('manga.id'))
+    manga_id = Column(Integer, ForeignKey('manga.id'), index=True)
 
     users = relationship("Character", back_populates="rank")
-    manga = relationship("Manga", back_populates="ranks")
\ No newline at end of file
+    manga = relationship("Manga", back_populates="ranks")
+
+################################################################ Imports ################################################################
+
+class ImportCheckpoint(Base):
+    # Avancement d'un import (importer.py) : position = nombre d'enregistrements déjà lus et validés en base
+    __tablename__ = "import_checkpoints"
+
+    id = Column(String, primary_key=True)
+    manga_id = Column(Integer, ForeignKey('manga.id'))
+    position = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,68 @@
+import base64
+import json
+from typing import Generic, List, Optional, TypeVar
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import and_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+def encode_cursor(sort: str, value, last_id: int) -> str:
+    raw = json.dumps([sort, value, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort or not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    return value, last_id
+
+def keyset_phases(sort_column, id_column, cursor: Optional[tuple] = None) -> list:
+    # Ordre (sort_column ASC NULLS LAST, id ASC) lu en deux parcours de l'index (sort_column, id) :
+    # les valeurs non NULL par comparaison de tuples, puis la queue NULL dans l'ordre des id.
+    # Chaque phase est un (filtre ou None, ordre) ; on passe à la suivante quand la précédente est épuisée.
+    if sort_column is id_column:
+        return [(id_column > cursor[1] if cursor else None, (id_column,))]
+    null_tail = (sort_column.is_(None), (id_column,))
+    if cursor is None:
+        return [(sort_column.is_not(None), (sort_column, id_column)), null_tail]
+    value, last_id = cursor
+    if value is None:
+        return [(and_(sort_column.is_(None), id_column > last_id), (id_column,))]
+    return [(tuple_(sort_column, id_column) > tuple_(value, last_id), (sort_column, id_column)), null_tail]
+
+async def paginate(db: AsyncSession, stmt, model, limit: int, cursor: Optional[str] = None, sort: str = "id", skip: Optional[int] = None, scalars: bool = True):
+    # scalars=False : stmt sélectionne des colonnes (dont id et la clé de tri), les lignes restent des Row
+    sort_column = getattr(model, sort)
+    id_column = model.id
+
+    if skip:
+        # Ancien mode offset, conservé pour compatibilité : coûte un parcours des lignes sautées
+        order_by = (id_column,) if sort_column is id_column else (sort_column.asc().nulls_last(), id_column)
+        phases = [(None, order_by)]
+        stmt = stmt.offset(skip)
+    else:
+        phases = keyset_phases(sort_column, id_column, decode_cursor(cursor, sort) if cursor else None)
+
+    rows = []
+    for where, order_by in phases:
+        phase = stmt.where(where) if where is not None else stmt
+        result = await db.execute(phase.order_by(*order_by).limit(limit + 1 - len(rows)))
+        rows.extend((result.scalars() if scalars else result).all())
+        if len(rows) > limit:
+            break
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, sort), last.id)
+    return {"items": rows, "next_cursor": next_cursor}
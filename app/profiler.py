@@ -0,0 +1,211 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import event
+from auth import get_current_user, verify_token
+from database import async_engine, engine
+from metrics import route_label
+
+# Profil SQL d'une requête : "off" (défaut, rien n'est installé), "header" (en-tête X-SQL-Profile
+# envoyé par un administrateur authentifié), "all" (toutes les requêtes, pour le développement)
+SQL_PROFILE = os.getenv("SQL_PROFILE", "off")
+SQL_PROFILE_ADMINS = {name.strip() for name in os.getenv("SQL_PROFILE_ADMINS", "").split(",") if name.strip()}
+SQL_PROFILE_HEADER = "x-sql-profile"
+# Même requête SQL exécutée au moins N fois avec N jeux de paramètres différents : candidate N+1
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "3"))
+SQL_PROFILE_MAX_STATEMENTS = int(os.getenv("SQL_PROFILE_MAX_STATEMENTS", "500"))
+SQL_PROFILE_KEEP = int(os.getenv("SQL_PROFILE_KEEP", "100"))
+
+if SQL_PROFILE not in ("off", "header", "all"):
+    raise ValueError(f"SQL_PROFILE must be off, header or all, not {SQL_PROFILE!r}")
+
+def is_admin(username: Optional[str]) -> bool:
+    return username in SQL_PROFILE_ADMINS
+
+def parameters_key(parameters) -> int:
+    # Empreinte des valeurs, pour compter les jeux de paramètres distincts sans les conserver
+    return hash(repr(parameters))
+
+def parameters_shape(parameters, executemany: bool):
+    # Types des paramètres, jamais leurs valeurs (le rapport ne doit pas recopier de données)
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "row": parameters_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+class SqlProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.started_at = datetime.now(timezone.utc)
+        self.duration = 0.0
+        self.statements = []
+        self.count = 0
+        self.db_seconds = 0.0
+        self.repeats = {}
+
+    def record(self, statement: str, parameters, executemany: bool, seconds: float):
+        self.count += 1
+        self.db_seconds += seconds
+        repeat = self.repeats.get(statement)
+        if repeat is None:
+            repeat = self.repeats[statement] = {"count": 0, "seconds": 0.0, "parameters": set()}
+        repeat["count"] += 1
+        repeat["seconds"] += seconds
+        if len(repeat["parameters"]) < SQL_PROFILE_MAX_STATEMENTS:
+            repeat["parameters"].add(parameters_key(parameters))
+        if len(self.statements) < SQL_PROFILE_MAX_STATEMENTS:
+            self.statements.append((statement, parameters_shape(parameters, executemany), seconds))
+
+    def n_plus_one(self) -> list:
+        # La même requête relancée avec les mêmes paramètres est un doublon, pas un N+1
+        candidates = [
+            {"statement": statement, "count": repeat["count"], "distinct_parameters": len(repeat["parameters"]), "total_ms": round(repeat["seconds"] * 1000, 3)}
+            for statement, repeat in self.repeats.items()
+            if len(repeat["parameters"]) >= SQL_PROFILE_REPEAT_THRESHOLD
+        ]
+        return sorted(candidates, key=lambda candidate: candidate["count"], reverse=True)
+
+    def summary(self) -> str:
+        return f"id={self.id}; statements={self.count}; db_ms={self.db_seconds * 1000:.3f}; n_plus_one={len(self.n_plus_one())}"
+
+    def report(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration * 1000, 3),
+            "statements": self.count,
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "truncated": self.count > len(self.statements),
+            "n_plus_one": self.n_plus_one(),
+            "queries": [
+                {"statement": statement, "parameters": shape, "duration_ms": round(seconds * 1000, 3)}
+                for statement, shape, seconds in self.statements
+            ],
+        }
+
+class ProfileStore:
+    # Derniers profils, consultables par /debug/sql-profiles/{id}
+    def __init__(self, keep: int = SQL_PROFILE_KEEP):
+        self.keep = keep
+        self._profiles = OrderedDict()
+
+    def add(self, profile: SqlProfile):
+        self._profiles[profile.id] = profile
+        while len(self._profiles) > self.keep:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[SqlProfile]:
+        return self._profiles.get(profile_id)
+
+    def latest(self) -> list:
+        return list(reversed(self._profiles.values()))
+
+profile_store = ProfileStore()
+
+current_profile: ContextVar = ContextVar("current_profile", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        context._profile_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, parameters, executemany, time.perf_counter() - context._profile_started)
+
+def bearer_user(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                return verify_token(token).username
+            except HTTPException:
+                return None
+    return None
+
+def wants_profile(scope) -> bool:
+    if SQL_PROFILE == "all":
+        return True
+    if not any(name == SQL_PROFILE_HEADER.encode() for name, _ in scope["headers"]):
+        return False
+    return is_admin(bearer_user(scope))
+
+class SqlProfilerMiddleware:
+    # Installé seulement si SQL_PROFILE != "off" ; sans en-tête, une recherche dans les en-têtes par requête
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or current_profile.get() is not None or not wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        profile = SqlProfile(scope["method"], scope["path"])
+        token = current_profile.set(profile)
+        # Une réponse servie par le cache n'exécute aucune requête SQL : on la recalcule
+        scope.setdefault("state", {})["bypass_cache"] = True
+        started = time.perf_counter()
+
+        async def send_with_profile(message):
+            # Résumé des requêtes exécutées avant l'envoi des en-têtes ; le rapport complet suit le corps
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-profile", f"{profile.summary()}; report=/fastapi/debug/sql-profiles/{profile.id}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            current_profile.reset(token)
+            profile.duration = time.perf_counter() - started
+            profile.route = route_label(scope)
+            profile_store.add(profile)
+
+def install():
+    for _engine in (engine, async_engine.sync_engine):
+        event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+
+if SQL_PROFILE != "off":
+    install()
+
+def require_admin(current_user: str = Depends(get_current_user)) -> str:
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="SQL profiles are restricted to SQL_PROFILE_ADMINS")
+    return current_user
+
+router = APIRouter()
+
+@router.get("/debug/sql-profiles")
+async def read_sql_profiles(current_user: str = Depends(require_admin)):
+    return [
+        {"id": profile.id, "method": profile.method, "path": profile.path, "status": profile.status, "statements": profile.count, "n_plus_one": len(profile.n_plus_one())}
+        for profile in profile_store.latest()
+    ]
+
+@router.get("/debug/sql-profiles/{profile_id}")
+async def read_sql_profile(profile_id: str, current_user: str = Depends(require_admin)):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="SQL profile not found")
+    return profile.report()
@@ -0,0 +1,136 @@
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from fastapi import HTTPException, Request, status
+from database import env_flag
+
+# Seau à jetons par utilisateur : RATE_LIMIT_RATE jetons par seconde, au plus RATE_LIMIT_BURST en réserve.
+# Chaque route coûte 1 jeton, sauf celles de RATE_LIMIT_COSTS ("MÉTHODE motif=coût", le premier motif gagne)
+RATE_LIMIT = env_flag("RATE_LIMIT", "true")
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "50"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "100"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_KEYS = int(os.getenv("RATE_LIMIT_KEYS", "100000"))
+
+DEFAULT_COSTS = (
+    ("POST */import", 50),
+    ("GET */export", 20),
+    ("POST */bulk", 10),
+    ("POST */batch", 5),
+    ("POST */assets", 10),
+    ("PUT */image", 10),
+    ("PUT */flag", 10),
+    ("GET */graph", 5),
+    ("GET */search", 3),
+    ("POST *", 2),
+    ("PUT *", 2),
+    ("PATCH *", 2),
+    ("DELETE *", 2),
+)
+
+def parse_costs(value: str) -> tuple:
+    costs = []
+    for item in value.split(","):
+        pattern, _, cost = item.rpartition("=")
+        if pattern.strip():
+            costs.append((pattern.strip(), float(cost)))
+    return tuple(costs)
+
+RATE_LIMIT_COSTS = parse_costs(os.getenv("RATE_LIMIT_COSTS", "")) + DEFAULT_COSTS
+
+class RateLimitBackend(ABC):
+    # take() renvoie 0 si les jetons sont accordés, sinon l'attente en secondes avant qu'ils le soient.
+    # Asynchrone pour qu'un backend partagé entre workers (Redis, PostgreSQL) puisse s'y brancher.
+    @abstractmethod
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+class InMemoryBackend(RateLimitBackend):
+    # Propre au processus : avec N workers, chaque utilisateur dispose de N seaux
+    def __init__(self, max_keys: int = RATE_LIMIT_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            tokens -= cost
+            wait = 0.0
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        # Le moins récemment vu est oublié : il retrouvera un seau plein
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets), "max_keys": self.max_keys}
+
+def create_backend(kind: str = RATE_LIMIT_BACKEND) -> RateLimitBackend:
+    if kind == "memory":
+        return InMemoryBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {kind!r}")
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend, rate: float = RATE_LIMIT_RATE, burst: float = RATE_LIMIT_BURST, costs=RATE_LIMIT_COSTS, enabled: bool = RATE_LIMIT):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.costs = costs
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited = 0
+        self._route_costs = {}
+
+    def cost_for(self, method: str, path: str) -> float:
+        # Une route plus chère que la réserve reste possible
+        name = f"{method} {path}"
+        cost = next((value for pattern, value in self.costs if fnmatchcase(name, pattern)), 1.0)
+        return min(cost, self.burst)
+
+    def cost(self, request: Request) -> float:
+        # Coût calculé une fois par (méthode, route)
+        route = request.scope.get("route")
+        key = (request.method, getattr(route, "path", request.url.path))
+        cost = self._route_costs.get(key)
+        if cost is None:
+            cost = self._route_costs[key] = self.cost_for(*key)
+        return cost
+
+    async def check(self, request: Request, user: str):
+        await self.charge(user, self.cost(request))
+
+    async def charge(self, user: str, cost: float):
+        if not self.enabled:
+            return
+        wait = await self.backend.take(user, min(cost, self.burst), self.rate, self.burst)
+        if wait > 0:
+            self.limited += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded, retry later",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "rate": self.rate,
+            "burst": self.burst,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            **self.backend.stats(),
+        }
+
+rate_limiter = RateLimiter(create_backend())
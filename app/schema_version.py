@@ -0,0 +1,36 @@
+import logging
+import os
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from database import engine
+
+# "strict" : refuse de démarrer si la base n'est pas à jour ; "warn" : simple avertissement ; "off" : aucune vérification
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "strict")
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+logger = logging.getLogger("schema")
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+def expected_heads() -> set:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+def current_heads() -> set:
+    # Lecture seule de la table alembic_version : aucun DDL au démarrage
+    with engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads())
+
+def check_schema(mode: str = SCHEMA_CHECK):
+    if mode == "off":
+        return
+    current, expected = current_heads(), expected_heads()
+    if current == expected:
+        return
+    message = f"database schema at {', '.join(sorted(current)) or 'no revision'}, expected {', '.join(sorted(expected))}; run `alembic upgrade head`"
+    if mode == "strict":
+        raise SchemaOutOfDate(message)
+    logger.warning(message)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Literal, Optional
+from datetime import datetime
 
 ################################################################ Users ################################################################
 
@@ -12,7 +13,7 @@ class UserCreate(BaseModel):
 
 class MangaBase(BaseModel):
     name: str
-    image: str
+    image: Optional[str] = None
 
 class MangaCreate(MangaBase):
     pass
@@ -41,6 +42,7 @@ class CharacterCreate(CharacterBase):
     rank_id: Optional[int]
     island_id: Optional[int]
     region_id: Optional[int]
+    manga_id: Optional[int] = None
 
 class CharacterOut(CharacterBase):
     id: int
@@ -55,10 +57,11 @@ class DevilFruitBase(BaseModel):
 
 class DevilFruitCreate(DevilFruitBase):
     type_id: int
+    manga_id: Optional[int] = None
 
 class DevilFruitOut(DevilFruitBase):
     id: int
-    type: str
+    type_id: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -81,7 +84,7 @@ class WeaponBase(BaseModel):
     name: str
 
 class WeaponCreate(WeaponBase):
-    pass
+    manga_id: Optional[int] = None
 
 class WeaponOut(WeaponBase):
     id: int
@@ -96,11 +99,10 @@ class HakiBase(BaseModel):
     type_id: int
 
 class HakiCreate(HakiBase):
-    pass
+    manga_id: Optional[int] = None
 
 class HakiOut(HakiBase):
     id: int
-    type: str
 
     class Config:
         orm_mode = True
@@ -124,10 +126,11 @@ class BoatBase(BaseModel):
 
 class BoatCreate(BoatBase):
     crew_id: int
+    manga_id: Optional[int] = None
 
 class BoatOut(BoatBase):
     id: int
-    crew: str
+    crew_id: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -139,7 +142,7 @@ class CrewBase(BaseModel):
     flag: Optional[str] = None
 
 class CrewCreate(CrewBase):
-    pass
+    manga_id: Optional[int] = None
 
 class CrewOut(CrewBase):
     id: int
@@ -156,10 +159,11 @@ class IslandBase(BaseModel):
 
 class IslandCreate(IslandBase):
     region_id: int
+    manga_id: Optional[int] = None
 
 class IslandOut(IslandBase):
     id: int
-    region: str
+    region_id: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -170,7 +174,7 @@ class RegionBase(BaseModel):
     name: str
 
 class RegionCreate(RegionBase):
-    pass
+    manga_id: Optional[int] = None
 
 class RegionOut(RegionBase):
     id: int
@@ -185,10 +189,176 @@ class RankBase(BaseModel):
     name: str
 
 class RankCreate(RankBase):
-    pass
+    manga_id: Optional[int] = None
 
 class RankOut(RankBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+################################################################ Expand ################################################################
+
+class CrewSummary(CrewBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class RegionSummary(RegionBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class CharacterExpandedOut(CharacterOut):
+    devil_fruit: Optional[DevilFruitOut] = None
+    crew: Optional[CrewSummary] = None
+    haki: Optional[HakiOut] = None
+    weapon: Optional[WeaponOut] = None
+    rank: Optional[RankOut] = None
+    island: Optional[IslandOut] = None
+    region: Optional[RegionSummary] = None
+    manga: Optional[MangaOut] = None
+
+class CrewExpandedOut(CrewOut):
+    manga: Optional[MangaOut] = None
+
+class IslandExpandedOut(IslandOut):
+    region: Optional[RegionSummary] = None
+    manga: Optional[MangaOut] = None
+    characters: Optional[list[CharacterOut]] = None
+
+class DevilFruitExpandedOut(DevilFruitOut):
+    type: Optional[DevilFruitTypeOut] = None
+    manga: Optional[MangaOut] = None
+    characters: Optional[list[CharacterOut]] = None
+
+################################################################ Search ################################################################
+
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    name: str
+    manga_id: Optional[int] = None
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    items: list[SearchHit] = []
+
+################################################################ Stats ################################################################
+
+class StrengthStats(BaseModel):
+    avg: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+
+class GroupCount(BaseModel):
+    id: int
+    name: Optional[str] = None
+    characters: int
+
+class MangaStats(BaseModel):
+    manga_id: int
+    characters: int = 0
+    crews: int = 0
+    islands: int = 0
+    devil_fruits: int = 0
+    strength: StrengthStats = StrengthStats()
+    per_crew: list[GroupCount] = []
+    per_rank: list[GroupCount] = []
+    refreshed_at: Optional[datetime] = None
+    refresh_pending: bool = False
+
+################################################################ Graph ################################################################
+
+class MangaSummary(BaseModel):
+    id: int
+    name: str
+
+class NodeTable(BaseModel):
+    columns: list[str]
+    rows: list[list[Any]] = []
+
+class MangaGraph(BaseModel):
+    manga: MangaSummary
+    nodes: dict[str, NodeTable]
+    edges: dict[str, list[tuple[int, int]]]
+
+################################################################ Leaderboard ################################################################
+
+class LeaderboardEntry(BaseModel):
+    position: int
+    id: int
+    name: Optional[str] = None
+    strength: float
+    manga_id: Optional[int] = None
+    crew_id: Optional[int] = None
+    rank_id: Optional[int] = None
+
+class Leaderboard(BaseModel):
+    manga_id: Optional[int] = None
+    crew_id: Optional[int] = None
+    rank_id: Optional[int] = None
+    items: list[LeaderboardEntry] = []
+
+################################################################ Batch ################################################################
+
+class BatchItem(BaseModel):
+    method: Literal["GET"] = "GET"
+    path: str
+
+class BatchRequest(BaseModel):
+    requests: list[BatchItem]
+
+class BatchItemResponse(BaseModel):
+    path: str
+    status: int
+    etag: Optional[str] = None
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: list[BatchItemResponse] = []
+
+################################################################ Bulk ################################################################
+
+class BulkCreated(BaseModel):
+    index: int
+    id: int
+
+class BulkRowError(BaseModel):
+    index: int
+    detail: Any
+
+class BulkResult(BaseModel):
+    created: list[BulkCreated] = []
+    errors: list[BulkRowError] = []
+
+################################################################ Import ################################################################
+
+class ImportResult(BaseModel):
+    import_id: str
+    manga_id: int
+    resumed_from: int = 0
+    processed: int = 0
+    imported: int = 0
+    failed: int = 0
+    created: dict[str, int] = {}
+    errors: list[BulkRowError] = []
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+################################################################ Assets ################################################################
+
+class AssetOut(BaseModel):
+    ref: str
+    url: str
+    media_type: str
+    size: int
+    width: int
+    height: int
+    thumbnails: dict[int, str] = {}
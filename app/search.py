@@ -0,0 +1,66 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func, literal, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import get_current_user
+from cache import cached_route
+from database import get_async_db
+from models import Boat, Character, Crew, DevilFruit, Haki, Island, Manga, Rank, Region, Weapon
+from schemas import SearchResults
+
+SEARCH_TYPES = {
+    "manga": Manga,
+    "character": Character,
+    "crew": Crew,
+    "island": Island,
+    "region": Region,
+    "devil_fruit": DevilFruit,
+    "weapon": Weapon,
+    "haki": Haki,
+    "boat": Boat,
+    "rank": Rank,
+}
+
+router = APIRouter(dependencies=[Depends(get_current_user)], route_class=cached_route(model.__table__.name for model in SEARCH_TYPES.values()))
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def parse_types(types: Optional[str]) -> list:
+    if not types:
+        return list(SEARCH_TYPES)
+    names = list(dict.fromkeys(name.strip() for name in types.split(",") if name.strip()))
+    unknown = [name for name in names if name not in SEARCH_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types {', '.join(unknown)}; searchable types: {', '.join(SEARCH_TYPES)}")
+    return names
+
+def search_query(type_name: str, model, q: str, limit: int, manga_id: Optional[int]):
+    # Toutes les conditions (%, <%, ILIKE) sont servies par l'index GIN gin_trgm_ops sur name
+    name = model.name
+    prefix = escape_like(q) + "%"
+    contains = "%" + escape_like(q) + "%"
+    score = (
+        func.greatest(func.similarity(name, q), func.word_similarity(q, name))
+        + case((name.ilike(prefix, escape="\\"), 1.0), else_=0.0)
+        + case((name.ilike(contains, escape="\\"), 0.5), else_=0.0)
+    ).label("score")
+    manga_column = model.id if model is Manga else model.manga_id
+    stmt = (
+        select(literal(type_name).label("type"), model.id, name.label("name"), manga_column.label("manga_id"), score)
+        .where(or_(name.op("%")(q), literal(q).op("<%")(name), name.ilike(contains, escape="\\")))
+        .order_by(score.desc(), model.id)
+        .limit(limit)
+    )
+    if manga_id is not None:
+        stmt = stmt.where(manga_column == manga_id)
+    return stmt
+
+@router.get("/search", response_model=SearchResults)
+async def search(q: str = Query(..., min_length=1, max_length=100), types: Optional[str] = None, manga_id: Optional[int] = None, limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+    # Chaque type est limité séparément (top-k sur son index) avant le classement global
+    queries = [search_query(type_name, SEARCH_TYPES[type_name], q, limit, manga_id).subquery().select() for type_name in parse_types(types)]
+    ranked = union_all(*queries).subquery()
+    stmt = select(ranked).order_by(ranked.c.score.desc(), ranked.c.type, ranked.c.id).limit(limit)
+    rows = (await db.execute(stmt)).mappings().all()
+    return {"query": q, "items": [dict(row) for row in rows]}
@@ -0,0 +1,88 @@
+import types
+from functools import lru_cache
+from typing import Optional, Sequence, Union, get_args, get_origin
+import orjson
+from fastapi import HTTPException, Response
+from pydantic import ConfigDict, create_model
+from sqlalchemy import inspect
+from database import env_flag
+
+# Listes servies sans objets ORM ni validation pydantic : colonnes Core sérialisées par orjson
+FAST_SERIALIZATION = env_flag("FAST_SERIALIZATION", "true")
+
+def schema_columns(model, schema) -> Optional[tuple]:
+    # Champs du schéma s'ils sont tous des colonnes de la table ; None si l'un d'eux est une relation
+    columns = inspect(model).columns
+    names = tuple(schema.model_fields)
+    if any(name not in columns for name in names):
+        return None
+    return names
+
+def is_int_field(annotation) -> bool:
+    if get_origin(annotation) in (Union, types.UnionType):
+        return int in get_args(annotation)
+    return annotation is int
+
+def float_to_int(value):
+    # Même conversion que la validation pydantic d'un champ int (9.0 -> 9)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+class RowEncoder:
+    def __init__(self, model, schema, names: Sequence[str]):
+        columns = inspect(model).columns
+        self.names = tuple(names)
+        self.columns = [getattr(model, name) for name in self.names]
+        self.converters = [
+            (position, float_to_int)
+            for position, name in enumerate(self.names)
+            if is_int_field(schema.model_fields[name].annotation) and columns[name].type.python_type is float
+        ]
+
+    def select_columns(self, *extra: str) -> list:
+        # Colonnes supplémentaires (tri, curseur) lues mais non renvoyées
+        return self.columns + [column for column in extra if column.key not in self.names]
+
+    def item(self, row) -> dict:
+        values = list(row[:len(self.names)])
+        for position, convert in self.converters:
+            values[position] = convert(values[position])
+        return dict(zip(self.names, values))
+
+    def item_response(self, row) -> Response:
+        return Response(orjson.dumps(self.item(row)), media_type="application/json")
+
+    def page_response(self, page: dict) -> Response:
+        content = {"items": [self.item(row) for row in page["items"]], "next_cursor": page["next_cursor"]}
+        return Response(orjson.dumps(content), media_type="application/json")
+
+def row_encoder(model, schema) -> Optional[RowEncoder]:
+    names = schema_columns(model, schema) if FAST_SERIALIZATION else None
+    return RowEncoder(model, schema, names) if names is not None else None
+
+def json_response(content) -> Response:
+    return Response(orjson.dumps(content), media_type="application/json")
+
+def parse_fields(fields: Optional[str], schema) -> list:
+    # ?fields=id,name : champs du schéma de sortie à renvoyer (dans l'ordre du schéma)
+    if not fields:
+        return []
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(names - set(schema.model_fields))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields {', '.join(unknown)}; available fields: {', '.join(schema.model_fields)}",
+        )
+    return [name for name in schema.model_fields if name in names]
+
+@lru_cache(maxsize=256)
+def fields_encoder(model, schema, names: tuple) -> RowEncoder:
+    return RowEncoder(model, schema, names)
+
+@lru_cache(maxsize=256)
+def trimmed_schema(schema, names: tuple):
+    # Schéma réduit aux champs demandés : seuls ces attributs sont lus sur l'objet ORM
+    fields = {name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in names}
+    return create_model(f"{schema.__name__}Fields", __config__=ConfigDict(from_attributes=True), **fields)
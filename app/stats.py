@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import get_current_user
+from bus import invalidation_bus
+from database import async_engine, get_async_db
+from models import Manga
+from schemas import MangaStats
+
+STATS_REFRESH_DELAY = float(os.getenv("STATS_REFRESH_DELAY", "2"))
+STATS_REFRESH_MAX_LAG = float(os.getenv("STATS_REFRESH_MAX_LAG", "30"))
+STATS_TABLES = frozenset({"manga", "characters", "crews", "islands", "devil_fruits", "ranks"})
+# Clé de verrou consultatif partagée par tous les workers
+STATS_LOCK_KEY = 0x6D616E6761
+
+logger = logging.getLogger("stats")
+
+# Vues matérialisées créées par la migration 0003 : MetaData à part, jamais créées par l'application
+views = MetaData()
+
+manga_stats = Table(
+    "manga_stats", views,
+    Column("manga_id", Integer, primary_key=True),
+    Column("characters", Integer),
+    Column("crews", Integer),
+    Column("islands", Integer),
+    Column("devil_fruits", Integer),
+    Column("strength_avg", Float),
+    Column("strength_min", Float),
+    Column("strength_max", Float),
+    Column("strength_p50", Float),
+    Column("strength_p90", Float),
+    Column("strength_p99", Float),
+    Column("refreshed_at", DateTime(timezone=True)),
+)
+
+manga_crew_counts = Table(
+    "manga_crew_counts", views,
+    Column("manga_id", Integer, primary_key=True),
+    Column("crew_id", Integer, primary_key=True),
+    Column("name", String),
+    Column("characters", Integer),
+)
+
+manga_rank_counts = Table(
+    "manga_rank_counts", views,
+    Column("manga_id", Integer, primary_key=True),
+    Column("rank_id", Integer, primary_key=True),
+    Column("name", String),
+    Column("characters", Integer),
+)
+
+async def refresh_views() -> bool:
+    async with async_engine.begin() as connection:
+        # Un seul REFRESH à la fois : si un autre worker rafraîchit déjà, on réessaiera plus tard
+        if not await connection.scalar(select(func.pg_try_advisory_xact_lock(STATS_LOCK_KEY))):
+            return False
+        for view in views.tables.values():
+            await connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}"))
+    return True
+
+class StatsRefresher:
+    # Les écritures sont regroupées : un REFRESH après `delay` secondes sans nouvelle écriture,
+    # et au plus `max_lag` secondes après la première écriture non prise en compte
+    def __init__(self, refresh, delay: float = STATS_REFRESH_DELAY, max_lag: float = STATS_REFRESH_MAX_LAG, enabled: bool = True):
+        self.refresh = refresh
+        self.enabled = enabled
+        self.delay = delay
+        self.max_lag = max_lag
+        self.refreshes = 0
+        self.retries = 0
+        self.failures = 0
+        self.last_duration = None
+        self.dirty_since = None
+        self._last_change = None
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+
+    @property
+    def pending(self) -> bool:
+        return self.dirty_since is not None
+
+    def on_change(self, table, ids):
+        # Appelé après commit, depuis la boucle ou depuis le threadpool (DB_MODE=sync)
+        loop = self._loop
+        if loop is not None and table in STATS_TABLES:
+            loop.call_soon_threadsafe(self._mark_dirty)
+
+    def _mark_dirty(self):
+        now = time.monotonic()
+        if self.dirty_since is None:
+            self.dirty_since = now
+        self._last_change = now
+        self._wakeup.set()
+
+    async def _wait_quiet(self):
+        while True:
+            remaining = min(self._last_change + self.delay, self.dirty_since + self.max_lag) - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await self._wait_quiet()
+            # Les écritures arrivées pendant le REFRESH redemandent un passage
+            self._wakeup.clear()
+            self.dirty_since = None
+            started = time.perf_counter()
+            try:
+                done = await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("stats refresh failed")
+                self.failures += 1
+                self._mark_dirty()
+                continue
+            if done:
+                self.refreshes += 1
+                self.last_duration = time.perf_counter() - started
+            else:
+                self.retries += 1
+                self._mark_dirty()
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._loop = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self.pending,
+            "delay": self.delay,
+            "max_lag": self.max_lag,
+            "refreshes": self.refreshes,
+            "retries": self.retries,
+            "failures": self.failures,
+            "last_duration_ms": round(self.last_duration * 1000, 2) if self.last_duration is not None else None,
+        }
+
+# Les vues matérialisées n'existent que sous PostgreSQL
+stats_refresher = StatsRefresher(refresh_views, enabled=async_engine.dialect.name == "postgresql")
+# Seules les écritures locales déclenchent un REFRESH : le worker qui a écrit s'en charge
+invalidation_bus.subscribe(stats_refresher.on_change, remote=False)
+
+router = APIRouter(dependencies=[Depends(get_current_user)])
+
+def group_counts(table, key: str, manga_id: int):
+    return (
+        select(table.c[key].label("id"), table.c.name, table.c.characters)
+        .where(table.c.manga_id == manga_id)
+        .order_by(table.c.characters.desc(), table.c[key])
+    )
+
+@router.get("/mangas/{manga_id}/stats", response_model=MangaStats)
+async def read_manga_stats(manga_id: int, db: AsyncSession = Depends(get_async_db), current_user: str = Depends(get_current_user)):
+    row = (await db.execute(select(manga_stats).where(manga_stats.c.manga_id == manga_id))).mappings().first()
+    if row is None:
+        if await db.get(Manga, manga_id) is None:
+            raise HTTPException(status_code=404, detail="Manga not found")
+        # Manga créé après le dernier REFRESH
+        return {"manga_id": manga_id, "refresh_pending": True}
+    return {
+        "manga_id": manga_id,
+        "characters": row["characters"],
+        "crews": row["crews"],
+        "islands": row["islands"],
+        "devil_fruits": row["devil_fruits"],
+        "strength": {name: row[f"strength_{name}"] for name in ("avg", "min", "max", "p50", "p90", "p99")},
+        "per_crew": [dict(group) for group in (await db.execute(group_counts(manga_crew_counts, "crew_id", manga_id))).mappings()],
+        "per_rank": [dict(group) for group in (await db.execute(group_counts(manga_rank_counts, "rank_id", manga_id))).mappings()],
+        "refreshed_at": row["refreshed_at"],
+        "refresh_pending": stats_refresher.pending,
+    }
@@ -0,0 +1,434 @@
+"""Banc de charge : peuple une base locale puis sollicite toutes les routes de l'API.
+
+    python benchmarks/load.py [--mangas 5] [--characters 5000] [--concurrency 10] [--requests 200]
+                              [--routes 'characters_*'] [--no-cache] [--url http://localhost:8000]
+                              [--output results.json] [--compare baseline.json]
+
+Sans DATABASE_URL, une base SQLite jetable (benchmarks/load.db) est recréée et peuplée à chaque
+lancement. Avec DATABASE_URL (PostgreSQL de docker-compose par exemple), --seed applique les
+migrations puis peuple la base, qui doit être vide.
+
+Par défaut l'application tourne dans le processus (httpx + ASGI), ce qui permet de compter les
+requêtes SQL de chaque appel ; avec --url le banc vise un serveur déjà lancé sur la même base
+et ne compte pas les requêtes SQL. Les variables d'environnement de l'application (DB_MODE,
+DB_POOL_SIZE, FAST_SERIALIZATION, ...) s'appliquent comme d'habitude.
+
+Chaque route est mesurée seule : --requests appels (un dixième pour /token et la création
+d'utilisateurs, qui hachent un mot de passe) répartis sur --concurrency clients. Le rapport JSON
+donne par route le débit, les latences p50/p95/p99 et le nombre de requêtes SQL par appel, avec
+le commit courant pour comparer les exécutions (--compare).
+"""
+import argparse
+import asyncio
+import fnmatch
+import inspect
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(ROOT, "..", "app")
+LOCAL_DB = os.path.join(ROOT, "load.db")
+USERNAME = "bench"
+PASSWORD = "bench"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mangas", type=int, default=5)
+    parser.add_argument("--characters", type=int, default=5000, help="total, réparti entre les mangas")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="appels par route")
+    parser.add_argument("--depth", type=float, default=0.9, help="position des pages profondes, en fraction des personnages")
+    parser.add_argument("--routes", default="*", help="motifs des routes à mesurer, séparés par des virgules")
+    parser.add_argument("--no-cache", action="store_true", help="désactive le cache des réponses (RESPONSE_CACHE_SIZE=0)")
+    parser.add_argument("--seed", action="store_true", help="migre et peuple la base de DATABASE_URL")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--url", help="serveur à solliciter au lieu de l'application dans le processus")
+    parser.add_argument("--output", help="fichier JSON du rapport (défaut : benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="rapport JSON d'une exécution précédente")
+    return parser.parse_args()
+
+args = parse_args()
+
+# Configuration lue à l'import des modules de l'application
+if "DATABASE_URL" not in os.environ:
+    if os.path.exists(LOCAL_DB):
+        os.remove(LOCAL_DB)
+    os.environ["DATABASE_URL"] = f"sqlite:///{LOCAL_DB}"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{LOCAL_DB}"
+    args.seed = True
+if args.no_cache:
+    os.environ["RESPONSE_CACHE_SIZE"] = "0"
+# Un seul utilisateur pour tout le banc : on mesure les routes, pas la limite de débit (RATE_LIMIT=true pour l'inclure)
+os.environ.setdefault("RATE_LIMIT", "false")
+os.environ.setdefault("ASSET_DIR", os.path.join(ROOT, "assets"))
+sys.path.insert(0, APP_DIR)
+
+import httpx
+from PIL import Image
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, func, insert, select, text
+import database
+from auth import get_password_hash
+from models import Boat, Character, Crew, DevilFruit, DevilFruitType, Haki, HakiType, Island, Manga, Rank, Region, User, Weapon
+from pagination import encode_cursor
+
+################################################################ Jeu de données ################################################################
+
+def insert_rows(connection, model, rows: list) -> list:
+    # Identifiants attribués par la base (séquences PostgreSQL à jour pour les créations du banc)
+    if not rows:
+        return []
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(connection.execute(stmt, rows).scalars())
+
+def pick(rng: random.Random, ids: list, ratio: float):
+    return rng.choice(ids) if ids and rng.random() < ratio else None
+
+def seed(mangas: int, characters: int, rng: random.Random) -> dict:
+    config = Config(os.path.join(APP_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(APP_DIR, "migrations"))
+    command.upgrade(config, "head")
+
+    per_manga = max(1, characters // mangas)
+    with database.engine.begin() as connection:
+        if connection.scalar(select(func.count()).select_from(Manga)):
+            sys.exit("La base contient déjà des mangas : --seed attend une base vide")
+        fruit_types = insert_rows(connection, DevilFruitType, [{"name": name} for name in ("Paramecia", "Zoan", "Logia")])
+        haki_types = insert_rows(connection, HakiType, [{"name": name} for name in ("Observation", "Armament", "Conqueror")])
+        insert_rows(connection, User, [{"name": USERNAME, "email": f"{USERNAME}@example.com", "hashed_password": get_password_hash(PASSWORD)}])
+        manga_ids = insert_rows(connection, Manga, [{"name": f"manga {m}", "image": f"manga-{m}.png"} for m in range(mangas)])
+        for m, manga_id in enumerate(manga_ids):
+            # Éventail proche des vraies données : beaucoup de personnages par équipage, d'île, de rang
+            named = lambda kind, count: [{"name": f"{kind} {m}-{i}", "manga_id": manga_id} for i in range(count)]
+            crews = insert_rows(connection, Crew, [{**row, "flag": f"flag-{row['name']}.png"} for row in named("crew", max(1, per_manga // 20))])
+            insert_rows(connection, Boat, [{**row, "crew_id": rng.choice(crews)} for row in named("boat", len(crews) + len(crews) // 2)])
+            regions = insert_rows(connection, Region, named("region", max(1, per_manga // 200)))
+            islands = insert_rows(connection, Island, [{**row, "region_id": rng.choice(regions)} for row in named("island", max(1, per_manga // 25))])
+            ranks = insert_rows(connection, Rank, named("rank", 12))
+            weapons = insert_rows(connection, Weapon, named("weapon", max(1, per_manga // 10)))
+            haki = insert_rows(connection, Haki, [{**row, "type_id": rng.choice(haki_types)} for row in named("haki", 9)])
+            fruits = insert_rows(connection, DevilFruit, [{**row, "type_id": rng.choice(fruit_types)} for row in named("fruit", max(1, per_manga // 8))])
+            rows = []
+            for i in range(per_manga):
+                island_id = pick(rng, islands, 0.7)
+                rows.append({
+                    "name": f"character {m}-{i}",
+                    "strength": float(rng.randint(0, 10000)) if rng.random() < 0.95 else None,
+                    "manga_id": manga_id,
+                    "crew_id": pick(rng, crews, 0.8),
+                    "devil_fruit_id": pick(rng, fruits, 0.3),
+                    "haki_id": pick(rng, haki, 0.4),
+                    "weapon_id": pick(rng, weapons, 0.3),
+                    "rank_id": pick(rng, ranks, 0.9),
+                    "island_id": island_id,
+                    "region_id": pick(rng, regions, 0.7) if island_id is None else rng.choice(regions),
+                })
+            insert_rows(connection, Character, rows)
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("ANALYZE"))
+    return dataset()
+
+def dataset() -> dict:
+    # Identifiants existants, pour viser des lignes réelles
+    with database.engine.connect() as connection:
+        ids = {model.__tablename__: list(connection.scalars(select(model.id).order_by(model.id))) for model in (Manga, Character, Crew, Island, DevilFruit, Weapon, Haki, Boat, Rank, Region)}
+        ids["crew_manga"] = dict(connection.execute(select(Crew.id, Crew.manga_id)).all())
+    if not ids["manga"] or not ids["characters"]:
+        sys.exit("Base vide : lancer avec --seed")
+    return ids
+
+################################################################ Routes ################################################################
+
+class Scenario:
+    def __init__(self, name: str, method: str, path: str, build, share: float = 1.0, expected=(200,), postgresql_only: bool = False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.build = build
+        self.share = share
+        self.expected = expected
+        self.postgresql_only = postgresql_only
+
+def scenarios(ids: dict, depth: float, rng: random.Random) -> list:
+    characters = ids["characters"]
+    deep_offset = int(len(characters) * depth)
+    deep_cursor = encode_cursor("id", characters[deep_offset - 1], characters[deep_offset - 1]) if deep_offset else None
+    created = []
+
+    def any_id(table):
+        return lambda state: rng.choice(ids[table])
+
+    def character_body(state):
+        manga_id = rng.choice(ids["manga"])
+        return {"name": f"bench {rng.random()}", "strength": rng.randint(0, 10000), "manga_id": manga_id, "crew_id": rng.choice(ids["crews"]),
+                "devil_fruit_id": None, "haki_id": None, "weapon_id": None, "rank_id": rng.choice(ids["ranks"]), "island_id": None, "region_id": None}
+
+    def get(path, params=None):
+        # Paramètres tirés au sort à chaque appel quand leur valeur est une fonction
+        return lambda state: {"url": path, "params": {key: value(state) if callable(value) else value for key, value in (params or {}).items()}}
+
+    def path_id(template, table):
+        return lambda state: {"url": template.format(rng.choice(ids[table]))}
+
+    def ids_param(table, count):
+        return lambda state: ",".join(str(value) for value in rng.sample(ids[table], min(count, len(ids[table]))))
+
+    def login(state):
+        return {"url": "/fastapi/token", "data": {"username": USERNAME, "password": PASSWORD}}
+
+    async def create_character(client, state):
+        response = await client.post("/fastapi/characters/", json=character_body(state))
+        if response.status_code == 200:
+            created.append(response.json()["id"])
+        return response
+
+    def update_character(state):
+        return {"url": f"/fastapi/characters/{created[state['index'] % len(created)]}", "json": character_body(state)} if created else None
+
+    def delete_character(state):
+        return {"url": f"/fastapi/characters/{created.pop()}"} if created else None
+
+    def image_bytes(color) -> bytes:
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 600), color).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    cover = image_bytes((200, 30, 30))
+    uploaded = []
+
+    async def upload_asset(client, state):
+        # Image différente à chaque appel : on mesure le stockage et les vignettes, pas la déduplication
+        response = await client.post("/fastapi/assets", content=image_bytes((state["index"] % 256, rng.randrange(256), rng.randrange(256))))
+        if response.status_code == 200:
+            uploaded.append(response.json())
+        return response
+
+    def read_asset(key):
+        return lambda state: {"url": key(uploaded[state["index"] % len(uploaded)])} if uploaded else None
+
+    lists = [
+        Scenario(f"{path}_list", "GET", f"/fastapi/{path}/", get(f"/fastapi/{path}/", {"limit": 50}))
+        for path in ("devilfruits", "weapons", "haki", "boats", "ranks", "regions", "islands", "crews")
+    ]
+    items = [
+        Scenario(f"{path}_item", "GET", f"/fastapi/{path}/{{id}}", path_id(f"/fastapi/{path}/{{}}", table))
+        for path, table in (("devilfruits", "devil_fruits"), ("weapons", "weapons"), ("haki", "haki"), ("boats", "boats"), ("ranks", "ranks"), ("regions", "regions"), ("islands", "islands"), ("crews", "crews"))
+    ]
+    return [
+        Scenario("token", "POST", "/fastapi/token", login, share=0.1),
+        Scenario("protected", "GET", "/fastapi/protected/", get("/fastapi/protected/")),
+        Scenario("mangas_list", "GET", "/fastapi/mangas/", get("/fastapi/mangas/")),
+        Scenario("mangas_item", "GET", "/fastapi/mangas/{id}", path_id("/fastapi/mangas/{}", "manga")),
+        Scenario("mangas_stats", "GET", "/fastapi/mangas/{id}/stats", path_id("/fastapi/mangas/{}/stats", "manga"), postgresql_only=True),
+        Scenario("mangas_graph", "GET", "/fastapi/mangas/{id}/graph", path_id("/fastapi/mangas/{}/graph", "manga")),
+        Scenario("characters_list", "GET", "/fastapi/characters/", get("/fastapi/characters/", {"limit": 100})),
+        Scenario("characters_list_sorted", "GET", "/fastapi/characters/?sort=strength", get("/fastapi/characters/", {"limit": 100, "sort": "strength"})),
+        Scenario("characters_list_deep_cursor", "GET", "/fastapi/characters/?cursor=", get("/fastapi/characters/", {"limit": 100, "cursor": deep_cursor})),
+        Scenario("characters_list_deep_skip", "GET", "/fastapi/characters/?skip=", get("/fastapi/characters/", {"limit": 100, "skip": deep_offset})),
+        Scenario("characters_list_expand", "GET", "/fastapi/characters/?expand=", get("/fastapi/characters/", {"limit": 100, "expand": "crew,devil_fruit,island,rank"})),
+        Scenario("characters_list_fields", "GET", "/fastapi/characters/?fields=", get("/fastapi/characters/", {"limit": 100, "fields": "id,name"})),
+        Scenario("characters_list_ids", "GET", "/fastapi/characters/?ids=", get("/fastapi/characters/", {"ids": ids_param("characters", 50)})),
+        Scenario("characters_item", "GET", "/fastapi/characters/{id}", path_id("/fastapi/characters/{}", "characters")),
+        Scenario("characters_item_expand", "GET", "/fastapi/characters/{id}?expand=", lambda state: {"url": f"/fastapi/characters/{rng.choice(characters)}", "params": {"expand": "crew,manga"}}),
+        Scenario("characters_export", "GET", "/fastapi/characters/export", get("/fastapi/characters/export")),
+        *lists,
+        *items,
+        Scenario("leaderboard", "GET", "/fastapi/leaderboard", get("/fastapi/leaderboard", {"manga_id": any_id("manga"), "k": 10})),
+        Scenario("leaderboard_crew", "GET", "/fastapi/leaderboard?crew_id=", lambda state: (lambda crew_id: {"url": "/fastapi/leaderboard", "params": {"manga_id": ids["crew_manga"][crew_id], "crew_id": crew_id, "k": 10}})(rng.choice(ids["crews"]))),
+        Scenario("search", "GET", "/fastapi/search", get("/fastapi/search", {"q": lambda state: rng.choice(("char", "crew 1", "island", "fruit 2-")), "limit": 10}), postgresql_only=True),
+        Scenario("batch", "POST", "/fastapi/batch", lambda state: {"url": "/fastapi/batch", "json": {"requests": [{"path": f"/fastapi/characters/{rng.choice(characters)}"} for _ in range(10)]}}),
+        Scenario("users_create", "POST", "/fastapi/users/", lambda state: {"url": "/fastapi/users/", "json": {"name": f"bench-{state['index']}-{rng.random()}", "email": f"{rng.random()}@example.com", "password": PASSWORD}}, share=0.1),
+        Scenario("characters_create", "POST", "/fastapi/characters/", create_character),
+        Scenario("characters_update", "PUT", "/fastapi/characters/{id}", update_character),
+        Scenario("characters_bulk", "POST", "/fastapi/characters/bulk", lambda state: {"url": "/fastapi/characters/bulk", "json": [character_body(state) for _ in range(100)]}, share=0.1),
+        Scenario("characters_delete", "DELETE", "/fastapi/characters/{id}", delete_character),
+        Scenario("assets_upload", "POST", "/fastapi/assets", upload_asset, share=0.1),
+        Scenario("assets_read", "GET", "/fastapi/assets/{name}", read_asset(lambda asset: asset["url"])),
+        Scenario("assets_thumbnail", "GET", "/fastapi/assets/{name}-128.webp", read_asset(lambda asset: asset["thumbnails"]["128"])),
+        Scenario("mangas_image", "PUT", "/fastapi/mangas/{id}/image", lambda state: {"url": f"/fastapi/mangas/{rng.choice(ids['manga'])}/image", "content": cover}),
+    ]
+
+################################################################ Mesure ################################################################
+
+# Compteur de requêtes SQL de l'appel en cours (application dans le processus seulement)
+current_queries: ContextVar = ContextVar("current_queries", default=None)
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = current_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+async def call(client, scenario: Scenario, state: dict):
+    # build renvoie les arguments de la requête (None : rien à faire), ou l'envoie lui-même s'il est asynchrone
+    if inspect.iscoroutinefunction(scenario.build):
+        return await scenario.build(client, state)
+    built = scenario.build(state)
+    if built is None:
+        return None
+    return await client.request(scenario.method, built.pop("url"), **built)
+
+async def run_scenario(client, scenario: Scenario, total: int, concurrency: int, count_queries: bool) -> dict:
+    latencies = []
+    queries = []
+    statuses = {}
+    cursor = iter(range(total))
+
+    async def worker():
+        for index in cursor:
+            counter = [0]
+            token = current_queries.set(counter if count_queries else None)
+            started = time.perf_counter()
+            try:
+                response = await call(client, scenario, {"index": index})
+                status = response.status_code if response is not None else "skipped"
+                if response is not None:
+                    await response.aread()
+            except httpx.HTTPError as error:
+                status = type(error).__name__
+            finally:
+                current_queries.reset(token)
+            if status == "skipped":
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(counter[0])
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) not in scenario.expected)
+    result = {"route": scenario.name, "method": scenario.method, "path": scenario.path, "requests": len(latencies), "errors": errors, "statuses": statuses}
+    if latencies:
+        result.update({
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "latency_ms": {
+                "mean": round(statistics.fmean(latencies), 3),
+                "p50": round(percentile(latencies, 0.50), 3),
+                "p95": round(percentile(latencies, 0.95), 3),
+                "p99": round(percentile(latencies, 0.99), 3),
+                "max": round(max(latencies), 3),
+            },
+            "queries_per_request": {"mean": round(statistics.fmean(queries), 2), "max": max(queries)} if count_queries else None,
+        })
+    return result
+
+async def authenticate(client) -> str:
+    response = await client.post("/fastapi/token", data={"username": USERNAME, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def run(selected: list, ids: dict) -> list:
+    results = []
+    if args.url:
+        transport = None
+        base_url = args.url.rstrip("/")
+        lifespan = None
+    else:
+        from main import app
+        for engine in (database.engine, database.async_engine.sync_engine):
+            event.listen(engine, "before_cursor_execute", count_query)
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        base_url = "http://bench"
+        lifespan = app.router.lifespan_context(app)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=60) as client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            client.headers["Authorization"] = f"Bearer {await authenticate(client)}"
+            for scenario in selected:
+                total = max(1, int(args.requests * scenario.share))
+                result = await run_scenario(client, scenario, total, args.concurrency, count_queries=transport is not None)
+                results.append(result)
+                print_result(result)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+    return results
+
+################################################################ Rapport ################################################################
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_result(result: dict):
+    latency = result.get("latency_ms") or {}
+    queries = result.get("queries_per_request") or {}
+    print(f"{result['route']:<30} {result['requests']:>6} {result.get('throughput_rps', 0):>9} {latency.get('p50', '-'):>9} {latency.get('p95', '-'):>9} {latency.get('p99', '-'):>9} {queries.get('mean', '-'):>7} {result['errors']:>6}", flush=True)
+
+def print_comparison(results: list, baseline: dict):
+    previous = {result["route"]: result for result in baseline["routes"]}
+    print(f"\ncomparaison avec {baseline['meta'].get('commit') or args.compare}")
+    print(f"{'route':<30} {'p50 (ms)':>20} {'p95 (ms)':>20} {'req/s':>20} {'sql/req':>12}")
+    for result in results:
+        before = previous.get(result["route"])
+        if before is None or "latency_ms" not in before or "latency_ms" not in result:
+            continue
+        delta = lambda old, new: f"{old:>8} -> {new:<8}"
+        old_queries = (before.get("queries_per_request") or {}).get("mean", "-")
+        new_queries = (result.get("queries_per_request") or {}).get("mean", "-")
+        print(f"{result['route']:<30} {delta(before['latency_ms']['p50'], result['latency_ms']['p50']):>20} {delta(before['latency_ms']['p95'], result['latency_ms']['p95']):>20} {delta(before['throughput_rps'], result['throughput_rps']):>20} {old_queries:>5} -> {new_queries:<4}")
+
+def main():
+    rng = random.Random(args.random_seed)
+    ids = seed(args.mangas, args.characters, rng) if args.seed else dataset()
+    patterns = [pattern.strip() for pattern in args.routes.split(",") if pattern.strip()]
+    # Vues matérialisées et pg_trgm : routes sans objet hors PostgreSQL
+    postgresql = database.engine.dialect.name == "postgresql"
+    selected = [
+        scenario for scenario in scenarios(ids, args.depth, rng)
+        if any(fnmatch.fnmatch(scenario.name, pattern) for pattern in patterns) and (postgresql or not scenario.postgresql_only)
+    ]
+    if not selected:
+        sys.exit(f"Aucune route ne correspond à {args.routes}")
+
+    print(f"{'route':<30} {'calls':>6} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'sql/req':>7} {'errors':>6}")
+    results = asyncio.run(run(selected, ids))
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "target": args.url or "in-process",
+            "database": database.engine.dialect.name,
+            "db_mode": database.DB_MODE,
+            "response_cache": not args.no_cache,
+            "dataset": {"mangas": len(ids["manga"]), "characters": len(ids["characters"]), "crews": len(ids["crews"]), "islands": len(ids["islands"])},
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+        },
+        "routes": results,
+    }
+    output = args.output or os.path.join(ROOT, "results", f"load-{(commit or 'unknown')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nrapport : {output}")
+    if args.compare:
+        with open(args.compare) as file:
+            print_comparison(results, json.load(file))
+
+if __name__ == "__main__":
+    main()
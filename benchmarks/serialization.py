@@ -0,0 +1,80 @@
+"""Compare le chemin ORM + pydantic et le chemin rapide (colonnes Core + orjson) des listes.
+
+    python benchmarks/serialization.py [--rows 100,1000,5000] [--repeat 20]
+
+Base SQLite en mémoire : mesure la lecture des lignes, l'hydratation et la sérialisation,
+pas le réseau ni PostgreSQL.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ASYNC_DATABASE_URL", "sqlite+aiosqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+from models import Character
+from pagination import Page
+from schemas import CharacterOut
+from serialization import RowEncoder, schema_columns
+
+def setup(rows: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as connection:
+        # Table seule : les index PostgreSQL (trigrammes, NULLS LAST) ne s'appliquent pas à SQLite
+        connection.execute(CreateTable(Character.__table__))
+        connection.execute(insert(Character.__table__), [{"name": f"character {i}", "strength": float(i % 97), "manga_id": 1} for i in range(rows)])
+    return engine
+
+def orm_path(engine, adapter) -> bytes:
+    # Chemin actuel : objets ORM, validation Page[CharacterOut], puis json.dumps comme JSONResponse
+    with Session(engine) as session:
+        items = session.scalars(select(Character).order_by(Character.id)).all()
+        content = adapter.dump_python(adapter.validate_python({"items": items, "next_cursor": None}, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def fast_path(engine, encoder) -> bytes:
+    with engine.connect() as connection:
+        rows = connection.execute(select(*encoder.columns).order_by(Character.id)).all()
+    return encoder.page_response({"items": rows, "next_cursor": None}).body
+
+def measure(fn, repeat: int) -> dict:
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(Page[CharacterOut])
+    encoder = RowEncoder(Character, CharacterOut, schema_columns(Character, CharacterOut))
+    results = []
+    for rows in (int(value) for value in args.rows.split(",")):
+        engine = setup(rows)
+        assert orm_path(engine, adapter) == fast_path(engine, encoder), "les deux chemins doivent produire le même JSON"
+        orm = measure(lambda: orm_path(engine, adapter), args.repeat)
+        fast = measure(lambda: fast_path(engine, encoder), args.repeat)
+        results.append({"rows": rows, "orm": orm, "fast": fast, "speedup": round(orm["median_ms"] / fast["median_ms"], 2)})
+        engine.dispose()
+
+    print(f"{'rows':>8} {'orm (ms)':>10} {'fast (ms)':>10} {'speedup':>8}")
+    for result in results:
+        print(f"{result['rows']:>8} {result['orm']['median_ms']:>10} {result['fast']['median_ms']:>10} {result['speedup']:>7}x")
+
+if __name__ == "__main__":
+    main()
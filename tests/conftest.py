@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Modules de l'application importés à plat, comme dans app/ ; base SQLite jetable
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+TEST_DB = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DB}")
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{TEST_DB}")
+
+@pytest.fixture(scope="session")
+def migrated():
+    from alembic import command
+    from alembic.config import Config
+    config = Config(os.path.join(APP_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(APP_DIR, "migrations"))
+    command.upgrade(config, "head")
+
+@pytest.fixture
+def client(migrated):
+    # Application complète (lifespan compris) avec un token valide
+    from fastapi.testclient import TestClient
+    import auth
+    import main
+    token = auth.create_access_token({"sub": "tester"})
+    with TestClient(main.app, headers={"Authorization": f"Bearer {token}"}) as client:
+        yield client
@@ -0,0 +1,27 @@
+import io
+from PIL import Image
+import assets
+from database import admission_gate
+
+def png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_upload_is_stored_before_taking_an_admission_slot(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "ASSET_DIR", str(tmp_path))
+    store_asset = assets.store_asset
+    in_flight = []
+    async def spy(chunks):
+        in_flight.append(admission_gate.in_flight)
+        return await store_asset(chunks)
+    monkeypatch.setattr(assets, "store_asset", spy)
+
+    manga_id = client.post("/fastapi/mangas/", json={"name": "Asset Manga"}).json()["id"]
+    response = client.put(f"/fastapi/mangas/{manga_id}/image", content=png(), headers={"Content-Type": "image/png"})
+    assert response.status_code == 200, response.text
+    assert client.get(f"/fastapi/mangas/{manga_id}").json()["image"] == response.json()["ref"]
+
+    missing = client.put("/fastapi/mangas/999999/image", content=png(), headers={"Content-Type": "image/png"})
+    assert missing.status_code == 404
+    assert in_flight == [0, 0] and admission_gate.in_flight == 0
@@ -0,0 +1,23 @@
+import pytest
+from fastapi import HTTPException
+import auth
+
+@pytest.fixture
+def revoked():
+    tokens = set()
+    auth.token_cache.clear()
+    auth.token_cache.is_revoked = lambda token, payload: token in tokens
+    yield tokens
+    auth.token_cache.is_revoked = None
+    auth.token_cache.clear()
+
+def test_revoked_token_rejected_after_being_cached(revoked):
+    token = auth.create_access_token({"sub": "luffy"})
+    assert auth.verify_token(token).username == "luffy"
+    assert auth.verify_token(token).username == "luffy"
+    assert auth.token_cache.stats()["hits"] >= 1
+    revoked.add(token)
+    with pytest.raises(HTTPException) as error:
+        auth.verify_token(token)
+    assert error.value.status_code == 401
+    assert auth.token_cache.stats()["size"] == 0
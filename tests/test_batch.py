@@ -0,0 +1,46 @@
+import asyncio
+import threading
+from fastapi.responses import StreamingResponse
+import batch
+from batch import sub_receive
+
+def test_streaming_response_completes_with_the_sub_request_receive():
+    # Un receive qui ne suspend jamais bloquerait la boucle : wait_for ne pourrait même pas expirer
+    async def lines():
+        for line in (b"a\n", b"b\n", b"c\n"):
+            await asyncio.sleep(0)
+            yield line
+
+    async def run():
+        receive, done = sub_receive()
+        chunks = []
+
+        async def send(message):
+            chunks.append(message.get("body", b""))
+
+        try:
+            await StreamingResponse(lines())({"type": "http", "asgi": {"version": "3.0"}}, receive, send)
+        finally:
+            done.set()
+        return b"".join(chunks)
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(asyncio.run(run())), daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert result == [b"a\nb\nc\n"]
+
+def test_streaming_routes_are_rejected_from_batches(client):
+    response = client.post("/fastapi/batch", json={"requests": [{"path": "/fastapi/characters/export"}, {"path": "/fastapi/crews/"}]})
+    assert response.status_code == 200
+    export, crews = response.json()["responses"]
+    assert export["status"] == 400
+    assert crews["status"] == 200
+
+def test_oversized_sub_response_returns_413(client, monkeypatch):
+    client.post("/fastapi/crews/", json={"name": "Heart Pirates"}).raise_for_status()
+    monkeypatch.setattr(batch, "BATCH_MAX_RESPONSE_BYTES", 16)
+    response = client.post("/fastapi/batch", json={"requests": [{"path": "/fastapi/crews/?limit=50"}]})
+    assert response.status_code == 200
+    assert response.json()["responses"][0]["status"] == 413
@@ -0,0 +1,30 @@
+import threading
+from cache import ResponseCache
+
+def test_invalidate_from_another_thread_keeps_the_cache_consistent():
+    # DB_MODE=sync : les invalidations arrivent du threadpool pendant que la boucle lit et remplit le cache
+    cache = ResponseCache(maxsize=64, ttl=60)
+    errors = []
+    done = threading.Event()
+
+    def invalidate():
+        try:
+            while not done.is_set():
+                cache.invalidate("characters", {1, 2, 3})
+                cache.invalidate("mangas")
+        except Exception as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=invalidate)
+    thread.start()
+    try:
+        for i in range(50000):
+            key = ("/characters", i % 200)
+            if cache.get(key) is None:
+                cache.set(key, b"x" * 10, "application/json", ("characters", "mangas"), cache.generation, ("characters", i % 5))
+    finally:
+        done.set()
+        thread.join()
+    assert errors == []
+    assert cache.bytes == 10 * len(cache._entries)
+    assert all(key in cache._entries for keys in cache._keys_by_table.values() for key in keys)
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base
+import changes
+from bus import invalidation_bus
+
+Base = declarative_base()
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+
+    # pysqlite gère mal les SAVEPOINT : la transaction est ouverte explicitement
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def published():
+    tables = []
+
+    def handler(table, ids):
+        tables.append(table)
+
+    handlers = list(invalidation_bus._handlers)
+    invalidation_bus.subscribe(handler)
+    yield tables
+    invalidation_bus._handlers[:] = handlers
+
+def test_savepoint_release_then_rollback_publishes_nothing(engine, published):
+    with Session(engine) as session:
+        with session.begin_nested():
+            session.add(Item(name="luffy"))
+        assert published == []
+        session.rollback()
+    assert published == []
+
+def test_savepoint_release_then_commit_publishes_once(engine, published):
+    with Session(engine) as session:
+        with session.begin_nested():
+            session.add(Item(name="luffy"))
+        assert published == []
+        session.commit()
+    assert published == ["items"]
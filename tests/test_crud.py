@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import event
+import database
+
+@pytest.fixture
+def foreign_keys():
+    # SQLite n'applique les clés étrangères qu'avec ce PRAGMA (PostgreSQL toujours)
+    def enable(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    engines = (database.engine, database.async_engine.sync_engine)
+    for engine in engines:
+        engine.dispose()
+        event.listen(engine, "connect", enable)
+    yield
+    for engine in engines:
+        event.remove(engine, "connect", enable)
+        engine.dispose()
+
+def test_delete_referenced_row_returns_409(client, foreign_keys):
+    crew = client.post("/fastapi/crews/", json={"name": "Straw Hat Pirates"}).json()
+    client.post("/fastapi/boats/", json={"name": "Going Merry", "crew_id": crew["id"]}).raise_for_status()
+    response = client.delete(f"/fastapi/crews/{crew['id']}")
+    assert response.status_code == 409
+    assert client.get(f"/fastapi/crews/{crew['id']}").status_code == 200
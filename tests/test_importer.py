@@ -0,0 +1,17 @@
+import json
+
+def test_import_into_new_manga_can_be_read_back(client):
+    body = "\n".join(json.dumps(row) for row in (
+        {"name": "Monkey D. Luffy", "strength": 100, "crew": "Straw Hat Pirates", "island": "Dawn Island", "region": "East Blue"},
+        {"name": "Roronoa Zoro", "strength": 90, "crew": "Straw Hat Pirates"},
+    ))
+    response = client.post("/fastapi/import", params={"manga": "Imported Manga"}, content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["imported"] == 2 and result["failed"] == 0
+
+    manga = client.get(f"/fastapi/mangas/{result['manga_id']}")
+    assert manga.status_code == 200
+    assert manga.json() == {"id": result["manga_id"], "name": "Imported Manga", "image": None}
+    listed = client.get("/fastapi/mangas/", params={"ids": result["manga_id"]}).json()["items"]
+    assert listed == [{"id": result["manga_id"], "name": "Imported Manga", "image": None}]
@@ -0,0 +1,70 @@
+import pytest
+from leaderboard import Board, leaderboard_index
+from ratelimit import rate_limiter
+
+def row(row_id: int, strength: float) -> dict:
+    return {"id": row_id, "name": f"Pirate {row_id}", "strength": strength, "manga_id": 1, "crew_id": None, "rank_id": None}
+
+def ids(rows) -> list:
+    return [item["id"] for item in rows]
+
+def test_board_orders_ties_by_id_and_keeps_size():
+    board = Board((1, None, None), [row(1, 50), row(3, 30)], size=3)
+    assert board.complete
+    board.insert(row(2, 30))
+    assert ids(board.top(3)) == [1, 2, 3]
+    # Quatrième ligne : la board ne garde que les trois meilleures et ne connaît plus la suite
+    board.insert(row(4, 40))
+    assert ids(board.top(3)) == [1, 4, 2] and not board.complete
+    board.insert(row(5, 10))
+    assert ids(board.top(3)) == [1, 4, 2]
+
+def test_board_removal_from_an_incomplete_board_asks_for_a_reload():
+    board = Board((1, None, None), [row(1, 50), row(2, 40), row(3, 30)], size=3)
+    assert not board.complete
+    board.remove(2)
+    assert ids(board.top(2)) == [1, 3]
+    assert board.top(3) is None
+
+@pytest.fixture
+def characters(client, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "enabled", False)
+    manga = client.post("/fastapi/mangas/", json={"name": "Leaderboard Manga"}).json()
+    references = dict.fromkeys(("devil_fruit_id", "crew_id", "haki_id", "weapon_id", "rank_id", "island_id", "region_id"))
+
+    def create(name: str, strength):
+        body = {"name": name, "strength": strength, "manga_id": manga["id"], **references}
+        return client.post("/fastapi/characters/", json=body).json()["id"]
+
+    def update(character_id: int, name: str, strength):
+        body = {"name": name, "strength": strength, "manga_id": manga["id"], **references}
+        client.put(f"/fastapi/characters/{character_id}", json=body).raise_for_status()
+
+    def top(k: int = 10) -> list:
+        return [(item["name"], item["strength"]) for item in client.get("/fastapi/leaderboard", params={"manga_id": manga["id"], "k": k}).json()["items"]]
+
+    return client, create, update, top
+
+def test_leaderboard_follows_character_writes_incrementally(characters):
+    client, create, update, top = characters
+    luffy, zoro, sanji, usopp = create("Luffy", 50), create("Zoro", 30), create("Sanji", 30), create("Usopp", 10)
+    assert top(3) == [("Luffy", 50), ("Zoro", 30), ("Sanji", 30)]
+    loads = leaderboard_index.loads
+
+    # Montée au classement, puis égalité départagée par l'id
+    update(usopp, "Usopp", 40)
+    assert top() == [("Luffy", 50), ("Usopp", 40), ("Zoro", 30), ("Sanji", 30)]
+    update(sanji, "Sanji", 40)
+    assert top() == [("Luffy", 50), ("Sanji", 40), ("Usopp", 40), ("Zoro", 30)]
+
+    # Sans force, le personnage sort du classement ; supprimé, il n'y revient pas
+    update(luffy, "Luffy", None)
+    assert top() == [("Sanji", 40), ("Usopp", 40), ("Zoro", 30)]
+    client.delete(f"/fastapi/characters/{sanji}").raise_for_status()
+    assert top() == [("Usopp", 40), ("Zoro", 30)]
+
+    # Une insertion entre dans la board existante
+    create("Nami", 35)
+    assert top() == [("Usopp", 40), ("Nami", 35), ("Zoro", 30)]
+    # Chaque écriture a été appliquée à la board chargée, sans la relire
+    assert leaderboard_index.loads == loads
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import select, text
+import database
+from models import Character
+from pagination import keyset_phases
+from ratelimit import rate_limiter
+
+@pytest.fixture
+def characters(client, monkeypatch):
+    # Beaucoup de petites pages : la limite de débit n'est pas ce qu'on teste ici
+    monkeypatch.setattr(rate_limiter, "enabled", False)
+    # Égalités et strength NULL, pour que les pages tombent au milieu d'une égalité et à la frontière NULL
+    references = dict.fromkeys(("devil_fruit_id", "crew_id", "haki_id", "weapon_id", "rank_id", "island_id", "region_id"))
+    for index, strength in enumerate((50, 10, None, 50, 30, None, 10, 50, None, 20, 30)):
+        client.post("/fastapi/characters/", json={"name": f"Pirate {index % 3}", "strength": strength, **references}).raise_for_status()
+    return client
+
+def walk(client, sort: str, limit: int) -> list:
+    ids, cursor = [], None
+    while True:
+        page = client.get("/fastapi/characters/", params={"sort": sort, "limit": limit, **({"cursor": cursor} if cursor else {})}).json()
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+@pytest.mark.parametrize("sort", ["name", "strength"])
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_cursor_pages_follow_nulls_last_order(characters, sort, limit):
+    with database.engine.connect() as connection:
+        expected = connection.execute(text(f"SELECT id FROM characters ORDER BY {sort} IS NULL, {sort}, id")).scalars().all()
+    assert walk(characters, sort, limit) == expected
+
+@pytest.mark.parametrize("sort", ["name", "strength"])
+@pytest.mark.parametrize("cursor", [None, ("Pirate 1", 5), (None, 5)])
+def test_keyset_phases_are_index_range_scans(migrated, sort, cursor):
+    # Chaque phase lit l'index (clé de tri, id) dans l'ordre : ni parcours de table ni tri temporaire
+    if cursor is not None and cursor[0] is not None and sort == "strength":
+        cursor = (30.0, cursor[1])
+    sort_column = getattr(Character, sort)
+    with database.engine.connect() as connection:
+        for where, order_by in keyset_phases(sort_column, Character.id, cursor):
+            stmt = select(Character.id).where(where).order_by(*order_by).limit(11)
+            sql = str(stmt.compile(database.engine, compile_kwargs={"literal_binds": True}))
+            plan = " ".join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+            # SQLite peut aussi prendre ix_characters_name : l'id (rowid) y suit déjà le nom
+            assert "USING" in plan and "INDEX" in plan, plan
+            assert "TEMP B-TREE" not in plan, plan
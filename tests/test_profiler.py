@@ -0,0 +1,18 @@
+import profiler
+
+STATEMENT = "SELECT boats.id, boats.name FROM boats WHERE boats.crew_id = ?"
+
+def test_repeats_with_different_parameters_are_n_plus_one():
+    profile = profiler.SqlProfile("GET", "/fastapi/crews/")
+    for crew_id in range(profiler.SQL_PROFILE_REPEAT_THRESHOLD):
+        profile.record(STATEMENT, (crew_id,), False, 0.001)
+    [candidate] = profile.n_plus_one()
+    assert candidate["statement"] == STATEMENT
+    assert candidate["distinct_parameters"] == profiler.SQL_PROFILE_REPEAT_THRESHOLD
+
+def test_repeats_with_the_same_parameters_are_not_n_plus_one():
+    profile = profiler.SqlProfile("GET", "/fastapi/crews/")
+    for _ in range(profiler.SQL_PROFILE_REPEAT_THRESHOLD * 2):
+        profile.record(STATEMENT, (1,), False, 0.001)
+    assert profile.n_plus_one() == []
+    assert "(1,)" not in str(profile.report())
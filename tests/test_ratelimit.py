@@ -0,0 +1,70 @@
+import pytest
+from database import admission_gate
+from ratelimit import InMemoryBackend, RateLimitBackend, rate_limiter
+
+@pytest.fixture
+def tight_limit():
+    saved = rate_limiter.backend, rate_limiter.rate, rate_limiter.burst, rate_limiter._route_costs
+    rate_limiter.backend, rate_limiter.rate, rate_limiter.burst, rate_limiter._route_costs = InMemoryBackend(), 0.001, 2, {}
+    yield
+    rate_limiter.backend, rate_limiter.rate, rate_limiter.burst, rate_limiter._route_costs = saved
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitBackend()
+
+def test_limited_request_is_rejected_before_taking_an_admission_slot(client, tight_limit):
+    # Paramètres différents à chaque appel : aucune réponse ne vient du cache
+    allowed = rate_limiter.allowed
+    assert client.get("/fastapi/crews/", params={"limit": 1}).status_code == 200
+    assert client.get("/fastapi/crews/", params={"limit": 2}).status_code == 200
+    # Une seule vérification par requête, même si get_current_user est déclaré deux fois
+    assert rate_limiter.allowed == allowed + 2
+    admitted = admission_gate.admitted
+    response = client.get("/fastapi/crews/", params={"limit": 3})
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
+    assert admission_gate.admitted == admitted
+
+def test_cached_responses_are_rate_limited(client, tight_limit):
+    assert client.get("/fastapi/crews/", params={"limit": 4}).status_code == 200
+    hit = client.get("/fastapi/crews/", params={"limit": 4})
+    assert hit.status_code == 200 and hit.headers["x-cache"] == "HIT"
+    assert client.get("/fastapi/crews/", params={"limit": 4}).status_code == 429
+
+def test_batch_pays_for_each_sub_request(client, tight_limit, monkeypatch):
+    rate_limiter.burst = 20
+    monkeypatch.setattr(rate_limiter, "costs", (("GET */crews/", 3),) + rate_limiter.costs)
+    # 5 pour le lot + 3 par sous-requête : 17 jetons sur 20, il n'en reste pas assez pour un second lot
+    crews = [{"path": f"/fastapi/crews/?limit={limit}"} for limit in range(1, 5)]
+    response = client.post("/fastapi/batch", json={"requests": crews})
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["responses"]] == [200] * 4
+    admitted = admission_gate.admitted
+    response = client.post("/fastapi/batch", json={"requests": crews[:1]})
+    assert response.status_code == 429
+    assert admission_gate.admitted == admitted
+
+def test_export_holds_an_admission_slot_until_the_stream_ends(client, monkeypatch):
+    import export
+    stream_partitions = export.stream_partitions
+    in_flight = []
+
+    async def spy(table):
+        async for partition in stream_partitions(table):
+            in_flight.append(admission_gate.in_flight)
+            yield partition
+        in_flight.append(admission_gate.in_flight)
+
+    monkeypatch.setattr(export, "stream_partitions", spy)
+    before = admission_gate.in_flight
+    assert client.get("/fastapi/crews/export").status_code == 200
+    assert in_flight and set(in_flight) == {before + 1}
+    assert admission_gate.in_flight == before
+
+    # Base saturée : 503 avant que le flux ne commence
+    in_flight.clear()
+    monkeypatch.setattr(admission_gate, "limit", 1)
+    monkeypatch.setattr(admission_gate, "in_flight", 1)
+    assert client.get("/fastapi/crews/export", params={"format": "csv"}).status_code == 503
+    assert in_flight == []